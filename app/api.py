@@ -1,24 +1,103 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import chromadb
-from bs4 import BeautifulSoup
-import requests
+import asyncio
+import json
+import time
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
-import google.generativeai as genai
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 from pathlib import Path
+from typing import List, Optional
+
+from app.batcher import EmbeddingBatcher
+from app.cache import LRUCache
+from app.filters import build_where
+from app.insights import generate_gemini_insights_async, insight_cache
+from app.jd_fetcher import JobDescriptionFetcher
+from app.metrics import METRICS_ENABLED, render_prometheus, server_timing_header, stage, stage_metrics, start_request
+from app.reranker import CrossEncoderReranker, select_results
+from app.retriever import load_retriever
 
 # Load environment variables
 env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 
-# Initialize Gemini directly (not via LangChain to avoid auth issues)
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-llm = genai.GenerativeModel('gemini-2.5-flash')
+INSIGHT_TOP_N = 3
+# "chroma" (HNSW via Chroma) or "numpy" (exact brute-force over the embedding
+# artifact in data/, which boots without opening Chroma)
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "chroma")
+N_RESULTS = 10
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "256"))
+MAX_BATCH_K = 50
+# Concurrent queries arriving within EMBED_BATCH_WAIT_MS share one encoder call
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+# HYBRID_SEARCH=1 fuses BM25 keyword hits with the dense results (reciprocal
+# rank fusion) for requests that don't set "hybrid" themselves. Off by default
+# until an evaluation run (evaluate.py --hybrid) shows it helps.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "0") == "1"
+# Optional cross-encoder second stage: /recommend over-fetches RERANK_CANDIDATES
+# hits and re-orders as many as fit within RERANK_BUDGET_MS of the request start
+RERANK_ENABLED = os.getenv("RERANK", "0") == "1"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+# Hits scoring below this (0-1, higher is better) are dropped. The score is the
+# one the results are ranked by: cosine similarity for dense search, the
+# normalised RRF score for hybrid, the cross-encoder probability when re-ranked.
+MIN_SCORE = float(os.getenv("MIN_SCORE", "0"))
+
+# Repeated queries skip the encoder (embedding cache) or the whole search
+# (response cache); both are keyed on whitespace- and case-normalized text.
+embedding_cache = LRUCache(
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+)
+response_cache = LRUCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the collection and embedding model in the background so the port
+    # opens immediately; /health reports ready once the warm-up query is done.
+    app.state.retriever = None
+    app.state.retriever_error = None
+    app.state.embedding_batcher = None
+    app.state.reranker = None
+    app.state.jd_fetcher = JobDescriptionFetcher(
+        ttl=float(os.getenv("JD_CACHE_TTL", "3600")),
+        max_bytes=int(os.getenv("JD_MAX_BYTES", "2000000")),
+        deadline=float(os.getenv("JD_FETCH_DEADLINE", "10"))
+    )
+
+    async def load():
+        try:
+            retriever = await asyncio.to_thread(load_retriever, RETRIEVER_BACKEND)
+            # Cached responses came from the old index
+            retriever.on_reopen = response_cache.clear
+            app.state.embedding_batcher = EmbeddingBatcher(
+                retriever.embed,
+                max_batch_size=EMBED_BATCH_SIZE,
+                max_wait_ms=EMBED_BATCH_WAIT_MS
+            )
+            if RERANK_ENABLED:
+                reranker = await asyncio.to_thread(CrossEncoderReranker)
+                await asyncio.to_thread(reranker.warm_up, RERANK_CANDIDATES)
+                app.state.reranker = reranker
+            app.state.retriever = retriever
+        except Exception as e:
+            app.state.retriever_error = str(e)
+            print(f"❌ Retriever failed to load: {str(e)}")
 
+    loader = asyncio.create_task(load())
+    yield
+    loader.cancel()
+    await app.state.jd_fetcher.aclose()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -28,81 +107,118 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-chroma_client = chromadb.PersistentClient(path="app/chroma_db")
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    # Per-stage durations plus the total, so clients (streamlit_app.py,
+    # evaluation/evaluate.py) can show where a request's time went
+    start = time.perf_counter()
+    timings = start_request()
+    response = await call_next(request)
+    total_ms = (time.perf_counter() - start) * 1000
+    response.headers["Server-Timing"] = server_timing_header(timings, total_ms)
+    if METRICS_ENABLED and request.url.path.startswith("/recommend"):
+        stage_metrics.observe(f"request:{request.url.path}", total_ms)
+    return response
+
+class RecommendFilters(BaseModel):
+    max_duration: Optional[int] = None        # minutes; assessments without a known duration are excluded
+    remote_testing: Optional[bool] = None
+    test_types: Optional[List[str]] = None    # any of these letters, e.g. ["K", "P"]
+    job_levels: Optional[List[str]] = None    # any of these levels, e.g. ["Entry-Level"]
+
+    def to_where(self):
+        return build_where(self.max_duration, self.remote_testing, self.test_types, self.job_levels)
 
 class QueryRequest(BaseModel):
     text: str
     use_ai: bool = True
+    filters: Optional[RecommendFilters] = None
+    hybrid: Optional[bool] = None             # defaults to HYBRID_SEARCH
+    rerank: Optional[bool] = None             # defaults to on when RERANK=1
+    min_score: Optional[float] = Field(default=None, ge=0, le=1)  # defaults to MIN_SCORE
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    k: int = N_RESULTS
+    filters: Optional[RecommendFilters] = None
+    hybrid: Optional[bool] = None
+    min_score: Optional[float] = Field(default=None, ge=0, le=1)
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint to verify API is running"""
+    """Health check endpoint to verify API is running and the retriever is ready"""
+    if app.state.retriever_error:
+        return JSONResponse(status_code=503, content={
+            "status": "error",
+            "message": f"Retriever failed to load: {app.state.retriever_error}"
+        })
+    if app.state.retriever is None:
+        return JSONResponse(status_code=503, content={
+            "status": "starting",
+            "message": "Loading vector DB and embedding model"
+        })
     return {
         "status": "healthy",
         "message": "SHL Assessment Recommender API is running"
     }
 
-def scrape_job_description(url: str) -> str:
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Hit/miss counters for the embedding, response and insight caches"""
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "insight_cache": insight_cache.stats(),
+        "jd_cache": app.state.jd_fetcher.stats()
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format: per-stage latency histograms and cache hit ratios"""
+    caches = await cache_metrics()
+    return PlainTextResponse(
+        render_prometheus({name.removesuffix("_cache"): stats for name, stats in caches.items()}),
+        media_type="text/plain; version=0.0.4"
+    )
+
+async def scrape_job_description(url: str) -> str:
     try:
-        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=50)
-        soup = BeautifulSoup(response.text, "html.parser")
-        job_desc_div = soup.select_one("div.job-description, section.description")
-        return job_desc_div.get_text(" ", strip=True) if job_desc_div else ""
+        with stage("scrape"):
+            return await app.state.jd_fetcher.fetch(url)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=400, detail="Scraping error: timed out fetching job description")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Scraping error: {str(e)}")
     
-def normalize_score(score: float) -> float:
-    try:
-        return max(0.0, min(1.0, abs(float(score))))
-    except:
-        return 0.5
-
-def generate_gemini_insights(description: str) -> str:
-    if not llm:
-        return "AI insights unavailable"
-    
-    try:
-        prompt = f"""As an HR expert, analyze this assessment description and provide 3 concise insights:
-        
-        Description: {description[:300]}
-        
-        Format as:
-        1. Key skills measured
-        2. Ideal candidate level
-        3. Best use case"""
-        
-        response = llm.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.5,
-                max_output_tokens=150
-            )
-        )
-        return response.text
-    except Exception as e:
-        print(f"Gemini API error: {str(e)}")
-        return "AI insights unavailable"
-
-@app.post("/recommend")
-async def recommend(request: QueryRequest):
-    try:
-        collection = chroma_client.get_collection("shl_assessments")
-    except ValueError:
+def get_retriever():
+    if app.state.retriever_error:
         raise HTTPException(status_code=500, detail="Vector DB not initialized")
+    if app.state.retriever is None:
+        raise HTTPException(status_code=503, detail="Retriever is still loading")
+    return app.state.retriever
 
-    query_text = request.text
-    if query_text.startswith(("http://", "https://")):
-        query_text = scrape_job_description(query_text)
+def normalize_query(text: str) -> str:
+    # URLs stay as given: their paths are case-sensitive and the JD fetcher
+    # caches by the exact URL
+    if text.startswith(("http://", "https://")):
+        return text.strip()
+    return " ".join(text.lower().split())
 
-    results = collection.query(
-        query_texts=[query_text],
-        n_results=10,
-        include=["metadatas", "documents", "distances"]
-    )
+async def embed_query(query_text: str):
+    key = normalize_query(query_text)
+    embedding = embedding_cache.get(key)
+    if embedding is None:
+        embedding = await app.state.embedding_batcher.embed(query_text)
+        embedding_cache.set(key, embedding)
+    return embedding
 
+def build_recommendations(results, row: int = 0, min_score: float = 0.0) -> list:
     recommendations = []
-    for i in range(len(results["ids"][0])):
-        metadata = results["metadatas"][0][i]
+    for i in range(len(results["ids"][row])):
+        score = results["scores"][row][i]
+        if score < min_score:
+            continue
+        metadata = results["metadatas"][row][i]
         recommendations.append({
             "name": metadata["name"],
             "url": metadata["url"],
@@ -113,8 +229,151 @@ async def recommend(request: QueryRequest):
             "remote_testing": metadata.get("remote_testing", "❓"),
             "adaptive_support": metadata.get("adaptive/irt_support", "❓"),
             "test_type": metadata.get("test_type", "Not specified"),
-            "score": normalize_score(results["distances"][0][i]),
-            "ai_insights": generate_gemini_insights(metadata["description"]) if request.use_ai and i < 3 else ""
+            "score": round(score, 4),
+            "ai_insights": ""
         })
+    return recommendations
+
+async def search_assessments(request: QueryRequest):
+    start = time.perf_counter()
+    retriever = get_retriever()
+    reranker = app.state.reranker
+    if request.rerank and reranker is None:
+        raise HTTPException(status_code=400, detail="Re-ranking is not enabled on this server (set RERANK=1)")
+    rerank = reranker is not None and request.rerank is not False
+
+    where = request.filters.to_where() if request.filters else None
+    hybrid = HYBRID_SEARCH if request.hybrid is None else request.hybrid
+    min_score = MIN_SCORE if request.min_score is None else request.min_score
+    cache_key = (normalize_query(request.text), N_RESULTS, json.dumps(where, sort_keys=True), hybrid, rerank, min_score)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        # Callers fill in ai_insights, so hand out copies
+        return [dict(rec) for rec in cached]
+
+    query_text = request.text
+    if query_text.startswith(("http://", "https://")):
+        query_text = await scrape_job_description(query_text)
+
+    with stage("embed"):
+        embedding = await embed_query(query_text)
+    # Filters are applied inside the vector query, so top-k stays exact
+    n_results = max(N_RESULTS, RERANK_CANDIDATES) if rerank else N_RESULTS
+    with stage("search"):
+        results = await asyncio.to_thread(retriever.query, [embedding], n_results, where, [query_text], hybrid)
+
+    complete = True
+    if rerank:
+        with stage("rerank"):
+            order, scores, complete = await asyncio.to_thread(
+                reranker.rerank,
+                query_text,
+                results["documents"][0],
+                results["scores"][0],
+                start + RERANK_BUDGET_MS / 1000
+            )
+        results = select_results(results, order, scores, N_RESULTS)
+    with stage("assemble"):
+        recommendations = build_recommendations(results, min_score=min_score)
+
+    # A re-rank cut short by the latency budget is served but not cached
+    if complete:
+        response_cache.set(cache_key, recommendations)
+    return [dict(rec) for rec in recommendations]
+
+@app.post("/recommend")
+async def recommend(request: QueryRequest):
+    recommendations = await search_assessments(request)
+
+    if request.use_ai:
+        with stage("insights"):
+            insights = await asyncio.gather(*(
+                generate_gemini_insights_async(rec["description"])
+                for rec in recommendations[:INSIGHT_TOP_N]
+            ))
+        for rec, insight in zip(recommendations, insights):
+            rec["ai_insights"] = insight
+
+    return recommendations
+
+@app.post("/recommend/stream")
+async def recommend_stream(request: QueryRequest):
+    """Stream recommendations as NDJSON: the search hits first, then one insight patch per top result as it completes"""
+    recommendations = await search_assessments(request)
+
+    async def insight_patch(index: int, description: str) -> dict:
+        return {
+            "type": "insight",
+            "index": index,
+            "ai_insights": await generate_gemini_insights_async(description)
+        }
+
+    async def events():
+        yield json.dumps({"type": "results", "results": recommendations}) + "\n"
+        if request.use_ai:
+            pending = [
+                insight_patch(i, rec["description"])
+                for i, rec in enumerate(recommendations[:INSIGHT_TOP_N])
+            ]
+            for patch in asyncio.as_completed(pending):
+                yield json.dumps(await patch) + "\n"
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/recommend/batch")
+async def recommend_batch(request: BatchQueryRequest):
+    """Recommend for many queries at once: one encoder call and one multi-query vector search"""
+    if not request.queries:
+        return []
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    if not 1 <= request.k <= MAX_BATCH_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_BATCH_K}")
+
+    retriever = get_retriever()
+
+    query_texts = list(request.queries)
+    url_positions = [i for i, text in enumerate(query_texts) if text.startswith(("http://", "https://"))]
+    scraped = await asyncio.gather(
+        *(scrape_job_description(query_texts[i]) for i in url_positions),
+        return_exceptions=True
+    )
+    # A URL that can't be scraped fails only its own entry
+    errors = {}
+    for i, text in zip(url_positions, scraped):
+        if isinstance(text, HTTPException):
+            errors[i] = text.detail
+        elif isinstance(text, Exception):
+            errors[i] = f"Scraping error: {str(text)}"
+        else:
+            query_texts[i] = text
+    positions = [i for i in range(len(query_texts)) if i not in errors]
+    texts = [query_texts[i] for i in positions]
+
+    rows = {}
+    if texts:
+        # Only texts missing from the embedding cache go through the encoder,
+        # all of them in a single call
+        embeddings = [embedding_cache.get(normalize_query(text)) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            with stage("embed"):
+                vectors = await asyncio.to_thread(retriever.embed, [texts[i] for i in missing])
+            for i, vector in zip(missing, vectors):
+                embeddings[i] = vector
+                embedding_cache.set(normalize_query(texts[i]), vector)
+
+        where = request.filters.to_where() if request.filters else None
+        hybrid = HYBRID_SEARCH if request.hybrid is None else request.hybrid
+        min_score = MIN_SCORE if request.min_score is None else request.min_score
+        with stage("search"):
+            results = await asyncio.to_thread(retriever.query, embeddings, request.k, where, texts, hybrid)
+        rows = {i: row for row, i in enumerate(positions)}
 
-    return recommendations
\ No newline at end of file
+    with stage("assemble"):
+        return [
+            {"query": query, "recommendations": [], "error": errors[i]} if i in errors
+            else {"query": query, "recommendations": build_recommendations(results, rows[i], min_score)}
+            for i, query in enumerate(request.queries)
+        ]
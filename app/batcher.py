@@ -0,0 +1,54 @@
+import asyncio
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embed requests into batched encoder calls.
+
+    Requests arriving within ``max_wait_ms`` of each other (or until
+    ``max_batch_size`` is reached) are encoded together in one call to
+    ``embed_fn``, which runs in a worker thread. Batches are encoded one at a
+    time, so requests that arrive while the encoder is busy join the next one.
+    """
+
+    def __init__(self, embed_fn, max_batch_size: int = 32, max_wait_ms: float = 5):
+        self._embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._timer = None
+        self._encode_lock = asyncio.Lock()
+        self._tasks = set()
+
+    async def embed(self, text: str):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._encode(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _encode(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            async with self._encode_lock:
+                vectors = await asyncio.to_thread(self._embed_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
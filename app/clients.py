@@ -0,0 +1,34 @@
+import asyncio
+import os
+
+import requests
+
+from app.jd_fetcher import JobDescriptionFetcher
+
+
+def pooled_session(concurrency: int) -> requests.Session:
+    """A requests session keeping up to ``concurrency`` connections per host alive"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def load_local_retriever():
+    """The RETRIEVER_BACKEND retriever (chroma by default), loaded in-process"""
+    from app.retriever import load_retriever
+
+    return load_retriever(os.getenv("RETRIEVER_BACKEND", "chroma"))
+
+
+def fetch_job_descriptions(urls: list) -> list:
+    """Job description text per URL, fetched concurrently; a failed fetch yields its exception"""
+    async def fetch_all():
+        fetcher = JobDescriptionFetcher()
+        try:
+            return await asyncio.gather(*(fetcher.fetch(url) for url in urls), return_exceptions=True)
+        finally:
+            await fetcher.aclose()
+
+    return asyncio.run(fetch_all())
@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` requests per second with bursts up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Crawler:
+    """Polite concurrent fetcher: one keep-alive session, a token bucket per host,
+    retries with exponential backoff and a bounded worker pool."""
+
+    def __init__(self, rate_per_host: float = 2.0, burst: int = 4, max_workers: int = 8,
+                 max_retries: int = 3, backoff: float = 1.0, timeout: float = 15, cache=None):
+        self.cache = cache
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': 'Mozilla/5.0'})
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._buckets = defaultdict(lambda: TokenBucket(self.rate_per_host, self.burst))
+        self._buckets_lock = threading.Lock()
+
+    def _bucket(self, url: str) -> TokenBucket:
+        with self._buckets_lock:
+            return self._buckets[urlsplit(url).netloc]
+
+    def _retry_delay(self, attempt: int, response=None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET with rate limiting and retries; the last response is returned once
+        retries are exhausted so callers can decide how to handle the status."""
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            self._bucket(url).acquire()
+            try:
+                response = self.session.get(url, **kwargs)
+            except requests.RequestException:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            time.sleep(self._retry_delay(attempt, response))
+
+    def fetch(self, url: str, **kwargs):
+        """Fetch a page's text, revalidating against the HTTP cache when one is set.
+
+        Returns ``(text, changed)``; ``changed`` is False when the server
+        answered 304 or sent back a body identical to the cached one.
+        """
+        if self.cache is None:
+            response = self.get(url, **kwargs)
+            response.raise_for_status()
+            return response.text, True
+
+        headers = dict(kwargs.pop("headers", {}))
+        headers.update(self.cache.conditional_headers(url))
+        response = self.get(url, headers=headers, **kwargs)
+        if response.status_code == 304:
+            self.cache.touch(url)
+            return self.cache.body(url), False
+
+        response.raise_for_status()
+        changed = self.cache.store(
+            url,
+            response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified")
+        )
+        return response.text, changed
+
+    def map(self, fn, items) -> list:
+        """Apply ``fn`` to every item on the worker pool, keeping input order"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(fn, items))
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
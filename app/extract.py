@@ -0,0 +1,281 @@
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; BeautifulSoup's html.parser is the fallback
+    lxml = None
+
+DESCRIPTION_KEYWORDS = ["entry-level", "position", "candidate", "assessment", "measure", "skill", "solution is for"]
+UNWANTED_KEYWORDS = ["Contact", "Practice Tests", "Support", "Login", "Buy Online", "Book a Demo"]
+BROWSER_NOTICE = "We recommend upgrading to a modern browser."
+
+# (container tag or None, container class, "p" or the class of the match) for
+# the CSS fallbacks "div.product-details p", ..., ".product-info .description"
+DESCRIPTION_CONTAINERS = [
+    ("div", "product-details", "p"),
+    ("div", "product-description", "p"),
+    ("div", "description-content", "p"),
+    ("section", "description", "p"),
+    (None, "product-info", "description"),
+]
+
+
+class Node:
+    """One element of the page in document order, independent of the parser backend"""
+
+    __slots__ = ("tag", "id", "classes", "style", "parent", "next_sibling", "element")
+
+    def __init__(self, tag, id, classes, style, parent, element):
+        self.tag = tag
+        self.id = id
+        self.classes = classes
+        self.style = style
+        self.parent = parent
+        self.next_sibling = None
+        self.element = element
+
+
+class ParsedPage:
+    """Everything field extraction needs, collected in a single walk of the document"""
+
+    def __init__(self):
+        self.nodes = []
+        self.headings = []
+        self.paragraphs = []
+        self.remote_testing_parent = None
+        self.test_type_parent = None
+        self.test_type_next_sibling = None
+
+    def add(self, node: Node):
+        index = len(self.nodes)
+        self.nodes.append(node)
+        if node.tag in ("h1", "h2", "h3", "h4"):
+            self.headings.append(index)
+        elif node.tag == "p":
+            self.paragraphs.append(index)
+        return index
+
+    def saw_text(self, text: str, parent: int, next_sibling):
+        # next_sibling is the backend's element; the walkers map it to an index
+        if self.remote_testing_parent is None and "Remote Testing:" in text:
+            self.remote_testing_parent = parent
+        if self.test_type_parent is None and "Test Type:" in text:
+            self.test_type_parent = parent
+            self.test_type_next_sibling = next_sibling
+
+
+def _walk_lxml(html) -> ParsedPage:
+    page = ParsedPage()
+    root = lxml.html.fromstring(html)
+    index_of = {}
+    previous_child = {}
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue  # comments and processing instructions
+        parent_element = element.getparent()
+        parent = index_of.get(parent_element) if parent_element is not None else None
+        index = page.add(Node(
+            element.tag,
+            element.get("id"),
+            element.get("class", "").split(),
+            element.get("style"),
+            parent,
+            element
+        ))
+        index_of[element] = index
+        if parent is not None:
+            if parent in previous_child:
+                page.nodes[previous_child[parent]].next_sibling = index
+            previous_child[parent] = index
+
+        # lxml keeps text on the element (.text) and after it (.tail)
+        if element.text:
+            page.saw_text(element.text, index, next((c for c in element if isinstance(c.tag, str)), None))
+        if element.tail and parent is not None:
+            page.saw_text(element.tail, parent, element.getnext())
+
+    # The marker's sibling element is resolved to its node index
+    if page.test_type_next_sibling is not None:
+        page.test_type_next_sibling = index_of.get(page.test_type_next_sibling)
+    return page
+
+
+def _walk_soup(html) -> ParsedPage:
+    page = ParsedPage()
+    soup = BeautifulSoup(html, "html.parser")
+    index_of = {}
+    previous_child = {}
+    for item in soup.descendants:
+        if isinstance(item, Tag):
+            parent = index_of.get(id(item.parent))
+            index = page.add(Node(
+                item.name,
+                item.get("id"),
+                item.get("class", []),
+                item.get("style"),
+                parent,
+                item
+            ))
+            index_of[id(item)] = index
+            if parent is not None:
+                if parent in previous_child:
+                    page.nodes[previous_child[parent]].next_sibling = index
+                previous_child[parent] = index
+        elif type(item) is NavigableString:
+            parent = index_of.get(id(item.parent))
+            if parent is not None:
+                page.saw_text(item, parent, item.find_next_sibling())
+
+    if page.test_type_next_sibling is not None:
+        page.test_type_next_sibling = index_of.get(id(page.test_type_next_sibling))
+    return page
+
+
+def parse_page(html) -> ParsedPage:
+    return _walk_lxml(html) if lxml is not None else _walk_soup(html)
+
+
+def _text(node: Node, separator: str = " ") -> str:
+    element = node.element
+    if isinstance(element, Tag):
+        return element.get_text(separator, strip=True)
+    return separator.join(t.strip() for t in element.xpath(".//text()") if t.strip())
+
+
+def _has_ancestor(page: ParsedPage, index: int, tag, class_name) -> bool:
+    parent = page.nodes[index].parent
+    while parent is not None:
+        node = page.nodes[parent]
+        if (tag is None or node.tag == tag) and class_name in node.classes:
+            return True
+        parent = node.parent
+    return False
+
+
+def is_green_marker(node: Node) -> bool:
+    # span.green-circle, circle.green, .green-dot, .status-green
+    return (
+        (node.tag == "span" and "green-circle" in node.classes)
+        or (node.tag == "circle" and "green" in node.classes)
+        or "green-dot" in node.classes
+        or "status-green" in node.classes
+    )
+
+
+def _first_after(page: ParsedPage, index: int, predicate):
+    for node in page.nodes[index + 1:]:
+        if predicate(node):
+            return node
+    return None
+
+
+def _descendants(page: ParsedPage, index: int):
+    # Descendants are the contiguous run of nodes after ``index`` whose
+    # ancestor chain reaches it
+    for later in range(index + 1, len(page.nodes)):
+        parent = page.nodes[later].parent
+        while parent is not None and parent > index:
+            parent = page.nodes[parent].parent
+        if parent != index:
+            break
+        yield page.nodes[later]
+
+
+def extract_description(page: ParsedPage) -> str:
+    description = ""
+
+    # Method 1: paragraphs directly following a "Description" heading
+    for index in page.headings:
+        if _text(page.nodes[index], "") == "Description":
+            following = index + 1
+            while following < len(page.nodes) and page.nodes[following].tag == "p":
+                description += _text(page.nodes[following]) + " "
+                following += 1
+            break
+
+    # Method 2: a container with Description id or class
+    if not description:
+        for index, node in enumerate(page.nodes):
+            if node.id == "Description" or "Description" in node.classes:
+                description = " ".join(_text(p) for p in _descendants(page, index) if p.tag == "p")
+                break
+
+    # Method 3: known description containers
+    if not description:
+        for container_tag, container_class, match in DESCRIPTION_CONTAINERS:
+            for index, node in enumerate(page.nodes):
+                matches = node.tag == "p" if match == "p" else match in node.classes
+                if matches and _has_ancestor(page, index, container_tag, container_class):
+                    description = _text(node)
+                    break
+            if description:
+                break
+
+    # Method 4: the first substantial paragraph with characteristic keywords
+    if not description or description == BROWSER_NOTICE:
+        for index in page.paragraphs:
+            text = _text(page.nodes[index])
+            if any(keyword in text.lower() for keyword in DESCRIPTION_KEYWORDS) and len(text) > 50:
+                description = text
+                break
+
+    if not description or description == BROWSER_NOTICE:
+        return ""
+    for keyword in UNWANTED_KEYWORDS:
+        description = description.replace(keyword, "")
+    return description.strip()
+
+
+def extract_remote_testing(page: ParsedPage) -> str:
+    if page.remote_testing_parent is None:
+        return "❓"
+
+    start = page.remote_testing_parent
+    green_dot = (
+        _first_after(page, start, lambda n: n.tag == "svg")
+        or _first_after(page, start, lambda n: n.tag == "span" and any("circle" in c or "dot" in c for c in n.classes))
+        or _first_after(page, start, lambda n: n.style and "green" in n.style.lower())
+        or next((n for n in page.nodes if is_green_marker(n)), None)
+    )
+    return "🟢" if green_dot else "🔴"
+
+
+def extract_test_type(page: ParsedPage) -> str:
+    if page.test_type_parent is None:
+        return "Type not specified"
+    container = _first_after(page, page.test_type_parent, lambda n: n.tag == "span")
+    if container is None and page.test_type_next_sibling is not None:
+        container = page.nodes[page.test_type_next_sibling]
+    return _text(container, "") if container is not None else "Not found"
+
+
+def extract_assessment_fields(html) -> dict:
+    """Pull every detail-page field from one walk over the document"""
+    page = parse_page(html)
+    fields = {
+        "description": extract_description(page) or "Description unavailable",
+        "duration": "Duration not specified",
+        "languages": [],
+        "job_level": "Level not specified",
+        "remote_testing": extract_remote_testing(page),
+        "test_type": extract_test_type(page),
+    }
+
+    for index in page.headings:
+        node = page.nodes[index]
+        if node.tag == "h1":
+            continue
+        heading_text = _text(node, "").lower()
+        sibling = page.nodes[node.next_sibling] if node.next_sibling is not None else None
+        sibling_text = _text(sibling, "") if sibling is not None else ""
+
+        if 'assessment length' in heading_text or 'duration' in heading_text:
+            if 'minutes' in sibling_text.lower():
+                fields["duration"] = sibling_text
+        elif 'languages' in heading_text:
+            fields["languages"] = [lang.strip() for lang in sibling_text.split(',') if lang.strip()]
+        elif 'job levels' in heading_text or 'job level' in heading_text:
+            fields["job_level"] = sibling_text
+
+    return fields
+
@@ -0,0 +1,93 @@
+import re
+
+# Chroma metadata values must be scalars, so list-valued fields (test type
+# letters, job levels) are stored as one boolean flag per value, e.g.
+# test_type_K=True or job_level_entry_level=True.
+UNKNOWN_DURATION = -1
+# SHL's test type codes; any other capital (the "T" of "Type not specified",
+# the "N" of "Not found") is placeholder text, not a type
+TEST_TYPE_CODES = frozenset("ABCDEKPS")
+
+
+def parse_duration_minutes(duration: str) -> int:
+    # "... = 49", "... = max 30", "... = 15 to 35": take the upper bound
+    numbers = [int(n) for n in re.findall(r"\d+", duration or "")]
+    return max(numbers) if numbers else UNKNOWN_DURATION
+
+
+def parse_test_types(test_type: str) -> list:
+    return sorted({letter for letter in (test_type or "") if letter in TEST_TYPE_CODES})
+
+
+def parse_job_levels(job_level: str) -> list:
+    levels = [level.strip() for level in (job_level or "").split(",")]
+    return [level for level in levels if level and level != "Level not specified"]
+
+
+def slugify(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", value.lower()).strip("_")
+
+
+def test_type_key(letter: str) -> str:
+    return f"test_type_{letter.upper()}"
+
+
+def job_level_key(level: str) -> str:
+    return f"job_level_{slugify(level)}"
+
+
+def typed_metadata(item: dict) -> dict:
+    metadata = {
+        "duration_minutes": parse_duration_minutes(item["duration"]),
+        "remote_testing_supported": item["remote_testing"] == "🟢",
+    }
+    for letter in parse_test_types(item["test_type"]):
+        metadata[test_type_key(letter)] = True
+    for level in parse_job_levels(item["job_level"]):
+        metadata[job_level_key(level)] = True
+    return metadata
+
+
+def _any_of(keys: list):
+    clauses = [{key: {"$eq": True}} for key in keys]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def build_where(max_duration: int = None, remote_testing: bool = None,
+                test_types: list = None, job_levels: list = None):
+    """Translate request filters into a Chroma ``where`` clause (None when unfiltered)"""
+    clauses = []
+    if max_duration is not None:
+        clauses.append({"duration_minutes": {"$lte": max_duration}})
+        clauses.append({"duration_minutes": {"$gte": 0}})
+    if remote_testing is not None:
+        clauses.append({"remote_testing_supported": {"$eq": remote_testing}})
+    if test_types:
+        clauses.append(_any_of([test_type_key(letter) for letter in test_types]))
+    if job_levels:
+        clauses.append(_any_of([job_level_key(level) for level in job_levels]))
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def matches(where: dict, metadata: dict) -> bool:
+    """Evaluate the subset of Chroma's where syntax that build_where produces"""
+    if "$and" in where:
+        return all(matches(clause, metadata) for clause in where["$and"])
+    if "$or" in where:
+        return any(matches(clause, metadata) for clause in where["$or"])
+
+    (key, condition), = where.items()
+    value = metadata.get(key)
+    if value is None:
+        return False
+    (operator, operand), = condition.items()
+    if operator == "$eq":
+        return value == operand
+    if operator == "$lte":
+        return value <= operand
+    if operator == "$gte":
+        return value >= operand
+    raise ValueError(f"Unsupported filter operator {operator}")
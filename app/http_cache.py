@@ -0,0 +1,83 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+HTTP_CACHE_PATH = os.path.join("data", "http_cache")
+
+
+class HTTPCache:
+    """On-disk cache of fetched pages for conditional re-scrapes.
+
+    An SQLite index keeps the ETag, Last-Modified and body hash per URL;
+    bodies are stored as ``bodies/<sha256>.html`` so identical pages share a
+    file and saved HTML can be reused offline (e.g. as parsing fixtures).
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_PATH):
+        self.path = path
+        self.bodies_path = os.path.join(path, "bodies")
+        Path(self.bodies_path).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_hash TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _entry(self, url: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, last_modified, body_hash FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+    def conditional_headers(self, url: str) -> dict:
+        entry = self._entry(url)
+        if entry is None or not os.path.exists(self._body_file(entry[2])):
+            return {}
+        etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def body(self, url: str) -> str:
+        entry = self._entry(url)
+        if entry is None:
+            raise KeyError(url)
+        with open(self._body_file(entry[2]), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def touch(self, url: str):
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def store(self, url: str, text: str, etag: str = None, last_modified: str = None) -> bool:
+        """Save a freshly downloaded body; returns True if it differs from the cached one"""
+        body_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        previous = self._entry(url)
+
+        body_file = self._body_file(body_hash)
+        if not os.path.exists(body_file):
+            with open(body_file, "w", encoding="utf-8") as f:
+                f.write(text)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body_hash, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body_hash, time.time())
+            )
+            self._conn.commit()
+        return previous is None or previous[2] != body_hash
+
+    def _body_file(self, body_hash: str) -> str:
+        return os.path.join(self.bodies_path, f"{body_hash}.html")
+
+    def close(self):
+        self._conn.close()
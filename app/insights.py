@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from app.cache import LRUCache
+from app.metrics import stage
+
+# Load environment variables
+env_path = Path('.') / '.env'
+load_dotenv(dotenv_path=env_path)
+
+# Initialize Gemini directly (not via LangChain to avoid auth issues)
+genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+llm = genai.GenerativeModel('gemini-2.5-flash')
+
+# Insight calls run concurrently; each gets its own deadline and all of them
+# share one process-wide concurrency limit so a burst cannot flood Gemini.
+INSIGHTS_UNAVAILABLE = "AI insights unavailable"
+INSIGHT_TIMEOUT = float(os.getenv("INSIGHT_TIMEOUT", "8"))
+INSIGHT_CONCURRENCY = int(os.getenv("INSIGHT_CONCURRENCY", "8"))
+insight_semaphore = asyncio.Semaphore(INSIGHT_CONCURRENCY)
+
+# Bump whenever the prompt or generation config changes so stale cached
+# insights are never served for the new prompt.
+PROMPT_VERSION = "1"
+INSIGHT_CACHE_PATH = os.getenv(
+    "INSIGHT_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "insight_cache.sqlite3")
+)
+
+insight_generation_config = genai.types.GenerationConfig(
+    temperature=0.5,
+    max_output_tokens=150
+)
+
+
+def build_insight_prompt(description: str) -> str:
+    return f"""As an HR expert, analyze this assessment description and provide 3 concise insights:
+        
+        Description: {description[:300]}
+        
+        Format as:
+        1. Key skills measured
+        2. Ideal candidate level
+        3. Best use case"""
+
+
+def insight_cache_key(description: str) -> str:
+    return hashlib.sha256(f"{PROMPT_VERSION}\n{description}".encode("utf-8")).hexdigest()
+
+
+class InsightCache:
+    """Content-addressed insight store: in-memory LRU over an on-disk SQLite table."""
+
+    def __init__(self, path: str = INSIGHT_CACHE_PATH, memory_size: int = 512):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._memory = LRUCache(maxsize=memory_size)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS insights (key TEXT PRIMARY KEY, insight TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, description: str):
+        key = insight_cache_key(description)
+        insight = self._memory.get(key)
+        if insight is not None:
+            return insight
+        with self._lock:
+            row = self._conn.execute("SELECT insight FROM insights WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._memory.set(key, row[0])
+        return row[0]
+
+    def set(self, description: str, insight: str):
+        key = insight_cache_key(description)
+        self._memory.set(key, insight)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO insights (key, insight) VALUES (?, ?)", (key, insight))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return self._memory.stats()
+
+
+insight_cache = InsightCache()
+
+
+async def generate_gemini_insights_async(description: str) -> str:
+    cached = insight_cache.get(description)
+    if cached is not None:
+        return cached
+
+    if not llm:
+        return INSIGHTS_UNAVAILABLE
+
+    async def _generate():
+        async with insight_semaphore:
+            with stage("gemini", report=False):
+                response = await llm.generate_content_async(
+                    build_insight_prompt(description),
+                    generation_config=insight_generation_config
+                )
+            return response.text
+
+    try:
+        # The deadline covers waiting for a slot as well as the call itself
+        insight = await asyncio.wait_for(_generate(), timeout=INSIGHT_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"Gemini API timeout after {INSIGHT_TIMEOUT}s")
+        return INSIGHTS_UNAVAILABLE
+    except Exception as e:
+        print(f"Gemini API error: {str(e)}")
+        return INSIGHTS_UNAVAILABLE
+
+    insight_cache.set(description, insight)
+    return insight
+
+
+def warm_insight_cache():
+    json_path = os.path.join("data", "shl_assessments_complete.json")
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"Could not find JSON file at {json_path}")
+
+    with open(json_path, "r", encoding="utf-8", errors="ignore") as f:
+        assessments = json.load(f)
+
+    descriptions = {item["description"] for item in assessments if isinstance(item, dict) and item.get("description")}
+    missing = [d for d in descriptions if insight_cache.get(d) is None]
+    print(f"✅ {len(descriptions) - len(missing)}/{len(descriptions)} insights already cached")
+
+    async def _warm():
+        # Chunks of INSIGHT_CONCURRENCY, so every call gets a slot at once and
+        # the per-call deadline only covers Gemini itself, not the queue
+        insights = []
+        for start in range(0, len(missing), INSIGHT_CONCURRENCY):
+            chunk = missing[start:start + INSIGHT_CONCURRENCY]
+            insights.extend(await asyncio.gather(*(generate_gemini_insights_async(d) for d in chunk)))
+            print(f"   {start + len(chunk)}/{len(missing)} done")
+        return insights
+
+    insights = asyncio.run(_warm())
+    failed = sum(1 for insight in insights if insight == INSIGHTS_UNAVAILABLE)
+    print(f"🚀 Generated {len(missing) - failed} insights ({failed} failed)")
+    print(f"📁 Insight cache stored at: {INSIGHT_CACHE_PATH}")
+
+
+if __name__ == "__main__":
+    warm_insight_cache()
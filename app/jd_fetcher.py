@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import httpx
+from bs4 import BeautifulSoup
+
+from app.cache import LRUCache
+from app.extract import lxml  # None when lxml is not installed
+
+JD_SELECTOR = "div.job-description, section.description"
+JD_XPATH = (
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' job-description ')]"
+    " | //section[contains(concat(' ', normalize-space(@class), ' '), ' description ')]"
+)
+
+
+def extract_job_description(html: bytes) -> str:
+    if lxml is not None:
+        try:
+            document = lxml.html.fromstring(html)
+        except lxml.etree.ParserError:
+            return ""  # empty, whitespace-only or comment-only body
+        matches = document.xpath(JD_XPATH)
+        if not matches:
+            return ""
+        # Same text as get_text(" ", strip=True) below: one space between text nodes
+        return " ".join(t.strip() for t in matches[0].xpath(".//text()") if t.strip())
+
+    job_desc_div = BeautifulSoup(html, "html.parser").select_one(JD_SELECTOR)
+    return job_desc_div.get_text(" ", strip=True) if job_desc_div else ""
+
+
+class JobDescriptionFetcher:
+    """Fetches and extracts job descriptions over a shared, pooled httpx client.
+
+    Extracted text is cached per URL for ``ttl`` seconds, so repeated URLs skip
+    the network. Once an entry goes stale it is revalidated with If-None-Match
+    when the server sent an ETag, and a 304 keeps the cached text.
+    """
+
+    def __init__(self, ttl: float = 3600, max_bytes: int = 2_000_000, deadline: float = 10,
+                 cache_size: int = 256):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.deadline = deadline
+        self._cache = LRUCache(maxsize=cache_size)
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": "Mozilla/5.0"},
+            timeout=httpx.Timeout(5.0, connect=3.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            follow_redirects=True
+        )
+
+    async def fetch(self, url: str) -> str:
+        cached = self._cache.get(url)
+        if cached is not None and time.monotonic() - cached["fetched_at"] < self.ttl:
+            return cached["text"]
+        return await asyncio.wait_for(self._fetch(url, cached), timeout=self.deadline)
+
+    async def _fetch(self, url: str, cached) -> str:
+        headers = {}
+        if cached is not None and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+
+        async with self._client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                cached["fetched_at"] = time.monotonic()
+                return cached["text"]
+            response.raise_for_status()
+
+            # Stop reading past max_bytes; the job description is near the top
+            # and a truncated document still parses
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= self.max_bytes:
+                    break
+            etag = response.headers.get("etag")
+
+        text = await asyncio.to_thread(extract_job_description, bytes(body[:self.max_bytes]))
+        self._cache.set(url, {"text": text, "etag": etag, "fetched_at": time.monotonic()})
+        return text
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    async def aclose(self):
+        await self._client.aclose()
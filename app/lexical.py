@@ -0,0 +1,77 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Keeps skill tokens whole: "c++", "c#", ".net", "asp.net", "node.js"
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9+#]+)*|\.[a-z]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "with", "who", "will", "can",
+}
+
+
+def tokenize(text: str) -> list:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory Okapi BM25 over a fixed corpus.
+
+    Per-posting impact scores (idf times the saturated, length-normalised term
+    frequency) are precomputed at build time, so a query is one scatter-add per
+    query term over that term's postings.
+    """
+
+    def __init__(self, documents: list, k1: float = 1.5, b: float = 0.75):
+        self.size = len(documents)
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for i, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            lengths[i] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term][0].append(i)
+                postings[term][1].append(tf)
+
+        average_length = float(lengths.mean()) if self.size and lengths.mean() > 0 else 1.0
+        length_norm = k1 * (1 - b + b * lengths / average_length)
+        self._postings = {}
+        for term, (docs, tfs) in postings.items():
+            docs = np.asarray(docs, dtype=np.int32)
+            tfs = np.asarray(tfs, dtype=np.float32)
+            idf = math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            self._postings[term] = (docs, idf * tfs * (k1 + 1) / (tfs + length_norm[docs]))
+
+    def search(self, query: str, k: int = 10, mask: np.ndarray = None) -> list:
+        """Top-k ``(document index, score)`` pairs; documents outside ``mask`` are skipped"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        if mask is not None:
+            scores[~mask] = 0
+
+        hits = np.flatnonzero(scores)
+        if not len(hits) or k <= 0:
+            return []
+        k = min(k, len(hits))
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """Fuse ranked lists of document indices into ``(index, score)`` pairs, best first.
+
+    Scores are divided by the best attainable fused score (rank 1 in every
+    list), so they fall in [0, 1]. Ties keep first-seen order.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, index in enumerate(ranking, 1):
+            fused[index] = fused.get(index, 0.0) + 1.0 / (k + rank)
+    best = len(rankings) / (k + 1)
+    return [(index, fused[index] / best) for index in sorted(fused, key=fused.get, reverse=True)]
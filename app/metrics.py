@@ -0,0 +1,117 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# METRICS=0 turns the stage timers into no-ops; the Server-Timing total is
+# always sent.
+METRICS_ENABLED = os.getenv("METRICS", "1") == "1"
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Stage durations of the request being served, for its Server-Timing header.
+# asyncio tasks and to_thread calls inherit the context, so they share the dict.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in milliseconds, Prometheus style"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+
+class StageMetrics:
+    """One histogram per stage name, created on first observation"""
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, duration_ms: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        histogram.observe(duration_ms)
+
+
+stage_metrics = StageMetrics()
+
+
+def start_request() -> dict:
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record(name: str, duration_ms: float, report: bool = True):
+    stage_metrics.observe(name, duration_ms)
+    timings = _request_timings.get()
+    if report and timings is not None:
+        timings[name] = timings.get(name, 0.0) + duration_ms
+
+
+@contextmanager
+def stage(name: str, report: bool = True):
+    """Time a block into the ``name`` histogram and, if ``report``, the request's Server-Timing"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000, report)
+
+
+def server_timing_header(timings: dict, total_ms: float) -> str:
+    entries = [f"{name};dur={duration:.1f}" for name, duration in timings.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+def render_prometheus(cache_stats: dict) -> str:
+    """Text exposition of the stage histograms and cache counters"""
+    lines = [
+        "# HELP shl_stage_duration_ms Time spent per serving stage in milliseconds",
+        "# TYPE shl_stage_duration_ms histogram",
+    ]
+    for name, histogram in sorted(stage_metrics.histograms.items()):
+        with histogram._lock:
+            counts, count, total = list(histogram.counts), histogram.count, histogram.sum
+        for bound, bucket_count in zip(histogram.buckets, counts):
+            lines.append(f'shl_stage_duration_ms_bucket{{stage="{name}",le="{bound}"}} {bucket_count}')
+        lines.append(f'shl_stage_duration_ms_bucket{{stage="{name}",le="+Inf"}} {count}')
+        lines.append(f'shl_stage_duration_ms_sum{{stage="{name}"}} {total}')
+        lines.append(f'shl_stage_duration_ms_count{{stage="{name}"}} {count}')
+
+    for metric, kind, help_text in (
+        ("hits", "counter", "Cache hits"),
+        ("misses", "counter", "Cache misses"),
+        ("size", "gauge", "Entries currently cached"),
+        ("hit_ratio", "gauge", "Hits over lookups since start"),
+    ):
+        suffix = "_total" if kind == "counter" else ""
+        lines.append(f"# HELP shl_cache_{metric}{suffix} {help_text}")
+        lines.append(f"# TYPE shl_cache_{metric}{suffix} {kind}")
+        for cache, stats in sorted(cache_stats.items()):
+            if metric == "hit_ratio":
+                lookups = stats["hits"] + stats["misses"]
+                value = stats["hits"] / lookups if lookups else 0.0
+            else:
+                value = stats[metric]
+            lines.append(f'shl_cache_{metric}{suffix}{{cache="{cache}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -1,33 +1,108 @@
 import chromadb
 from chromadb.errors import NotFoundError  # Add this import
 from sentence_transformers import SentenceTransformer
+import argparse
+import hashlib
 import json
 import os
 from pathlib import Path
 from typing import List
 
+import numpy as np
+
+from app.filters import typed_metadata
+
+# Embedding artifact shipped next to the catalog JSON: an (n, dim) float32
+# matrix (.npy, memory-mappable) plus a JSON manifest with the model name,
+# dimension, matrix checksum and the ids, documents and metadata in row order.
+EMBEDDINGS_ARTIFACT_VERSION = 1
+EMBEDDINGS_ARTIFACT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "shl_assessments_embeddings"
+)
+
+# Rebuilds go into the shadow collection, which is then renamed over the live
+# one so a running API never sees a half-built index. The replaced collection
+# is kept as the retired one until the next build, so handles still pointing
+# at it keep working until they re-resolve the name.
+COLLECTION_NAME = "shl_assessments"
+SHADOW_COLLECTION_NAME = "shl_assessments__shadow"
+RETIRED_COLLECTION_NAME = "shl_assessments__retired"
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
 class ChromaEmbeddingFunction:
-    def __init__(self):
-        self._model = SentenceTransformer("all-MiniLM-L6-v2")
-    
-    def __call__(self, input: List[str]) -> List[List[float]]:
-        embeddings = self._model.encode(input)
-        return [embedding.tolist() for embedding in embeddings]
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, batch_size: int = 64, normalize_embeddings: bool = True):
+        self._model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.normalize_embeddings = normalize_embeddings
     
+    def __call__(self, input: List[str]) -> np.ndarray:
+        # float32 rows go straight to Chroma/NumPy, no per-element list conversion
+        embeddings = self._model.encode(
+            input,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize_embeddings,
+            convert_to_numpy=True
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def dimension(self) -> int:
+        return self._model.get_sentence_embedding_dimension()
+
+    def embed_documents(self, texts: List[str], processes: int = 0) -> np.ndarray:
+        """Embed a large corpus: length-sorted batches, optionally spread over a process pool"""
+        if not texts:
+            return np.empty((0, self.dimension()), dtype=np.float32)
+
+        # Longest first, so each batch holds similar lengths and pads little
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        sorted_texts = [texts[i] for i in order]
+
+        if processes > 1:
+            pool = self._model.start_multi_process_pool(target_devices=["cpu"] * processes)
+            try:
+                vectors = self._model.encode_multi_process(sorted_texts, pool, batch_size=self.batch_size)
+            finally:
+                self._model.stop_multi_process_pool(pool)
+            vectors = np.asarray(vectors, dtype=np.float32)
+            if self.normalize_embeddings:
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        else:
+            vectors = self(sorted_texts)
+
+        embeddings = np.empty_like(vectors)
+        embeddings[order] = vectors
+        return embeddings
+
 
 def stringify(value):
     if isinstance(value, list):
         return ", ".join(map(str, value))
     return value
 
-def create_vector_db():
-    # Initialize ChromaDB with explicit path
-    chroma_path = os.path.join("app", "chroma_db")
-    Path(chroma_path).mkdir(parents=True, exist_ok=True)
-    chroma_client = chromadb.PersistentClient(path=chroma_path)
+def assessment_id(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
 
-    # Find JSON file
-    json_path = os.path.join("data", "shl_assessments_complete.json")
+def content_hash(document: str, metadata: dict, model_name: str, normalize_embeddings: bool) -> str:
+    # The embedding settings are part of the hash, so switching models
+    # re-embeds everything instead of mixing old and new vectors
+    payload = json.dumps([document, metadata, model_name, normalize_embeddings], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get_collection_or_none(chroma_client, name: str):
+    try:
+        return chroma_client.get_collection(name)
+    except (NotFoundError, ValueError):
+        return None
+
+def delete_collection_if_exists(chroma_client, name: str):
+    try:
+        chroma_client.delete_collection(name)
+    except (NotFoundError, ValueError):
+        pass  # Collection didn't exist
+
+def prepare_documents(json_path: str):
     if not os.path.exists(json_path):
         raise FileNotFoundError(f"Could not find JSON file at {json_path}")
 
@@ -42,6 +117,7 @@ def create_vector_db():
     # Prepare documents and metadata
     documents = []
     metadatas = []
+    seen_urls = set()
     
     for i, item in enumerate(assessments):
         if not isinstance(item, dict):
@@ -52,6 +128,12 @@ def create_vector_db():
         if not all(field in item for field in required_fields):
             print(f"⚠️ Skipping incomplete item at index {i}")
             continue
+
+        # Ids are derived from the URL, so each assessment may appear once
+        if item["url"] in seen_urls:
+            print(f"⚠️ Skipping duplicate item at index {i}")
+            continue
+        seen_urls.add(item["url"])
             
         documents.append(f"{item['name']}: {item['description']}: {item['url']}: {item['duration']}: {item['languages']}: {item['job_level']}: {item['remote_testing']}: {item['adaptive/irt_support']}: {item['test_type']}")
         metadatas.append({
@@ -63,38 +145,113 @@ def create_vector_db():
             "job_level": item["job_level"],
             "remote_testing": item["remote_testing"],
             "adaptive/irt_support": item["adaptive/irt_support"],
-            "test_type": item["test_type"]
+            "test_type": item["test_type"],
+            **typed_metadata(item)
         })
 
+    return documents, metadatas
+
+def matrix_checksum(matrix) -> str:
+    return hashlib.sha256(np.ascontiguousarray(matrix, dtype=np.float32).tobytes()).hexdigest()
+
+def create_embeddings_artifact(ids, documents, metadatas, embeddings, model_name: str,
+                               artifact_path: str = EMBEDDINGS_ARTIFACT_PATH):
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    manifest = {
+        "format_version": EMBEDDINGS_ARTIFACT_VERSION,
+        "model_name": model_name,
+        "dimension": int(matrix.shape[1]),
+        "count": int(matrix.shape[0]),
+        "checksum": matrix_checksum(matrix),
+        "ids": ids,
+        "documents": documents,
+        "metadatas": metadatas
+    }
+
+    # Write both files aside first, then move them into place
+    with open(artifact_path + ".npy.tmp", "wb") as f:
+        np.save(f, matrix)
+    with open(artifact_path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(artifact_path + ".npy.tmp", artifact_path + ".npy")
+    os.replace(artifact_path + ".json.tmp", artifact_path + ".json")
+    print(f"📁 Embedding artifact stored at: {artifact_path}.npy/.json")
+
+def create_vector_db(batch_size: int = 64, processes: int = 0,
+                     chroma_path: str = os.path.join("app", "chroma_db"),
+                     json_path: str = os.path.join("data", "shl_assessments_complete.json"),
+                     artifact_path: str = EMBEDDINGS_ARTIFACT_PATH):
+    # Initialize ChromaDB with explicit path
+    Path(chroma_path).mkdir(parents=True, exist_ok=True)
+    chroma_client = chromadb.PersistentClient(path=chroma_path)
+
+    documents, metadatas = prepare_documents(json_path)
+
     if not documents:
         raise ValueError("No valid assessments found in JSON data")
 
-    # Create or recreate collection
-    try:
-        chroma_client.delete_collection("shl_assessments")
-        print("♻️ Replaced existing collection")
-    except NotFoundError:  # Changed from ValueError
-        print("📝 Creating new collection")
-        pass  # Collection didn't exist
+    embedding_function = ChromaEmbeddingFunction(batch_size=batch_size)
+    ids = [assessment_id(metadata["url"]) for metadata in metadatas]
+    for document, metadata in zip(documents, metadatas):
+        metadata["content_hash"] = content_hash(
+            document,
+            metadata,
+            embedding_function.model_name,
+            embedding_function.normalize_embeddings
+        )
 
-    # Create collection with proper embedding function
-    collection = chroma_client.create_collection(
-        name="shl_assessments",
-        embedding_function=ChromaEmbeddingFunction()
-    )
-
-    # Add data in batches
-    batch_size = 100
-    for i in range(0, len(documents), batch_size):
-        batch_end = min(i + batch_size, len(documents))
-        collection.add(
-            documents=documents[i:batch_end],
-            metadatas=metadatas[i:batch_end],
-            ids=[str(j) for j in range(i, batch_end)]
+    # Reuse stored embeddings for assessments whose content hasn't changed
+    existing = {}
+    live = get_collection_or_none(chroma_client, COLLECTION_NAME)
+    if live is not None:
+        stored = live.get(include=["metadatas", "embeddings"])
+        for stored_id, stored_metadata, stored_embedding in zip(stored["ids"], stored["metadatas"], stored["embeddings"]):
+            existing[stored_id] = (stored_metadata.get("content_hash"), stored_embedding)
+
+    changed = [i for i, doc_id in enumerate(ids) if existing.get(doc_id, (None,))[0] != metadatas[i]["content_hash"]]
+    removed = set(existing) - set(ids)
+    print(f"♻️ {len(ids) - len(changed)} unchanged, {len(changed)} new or changed, {len(removed)} removed")
+
+    # Embed only new or changed documents
+    embeddings = [existing[doc_id][1] if doc_id in existing else None for doc_id in ids]
+    new_embeddings = embedding_function.embed_documents([documents[i] for i in changed], processes=processes)
+    for i, embedding in zip(changed, new_embeddings):
+        embeddings[i] = embedding
+
+    if live is not None and not changed and not removed:
+        print("✅ Vector DB already up to date")
+    else:
+        # Build the complete index in the shadow collection, then swap it in
+        delete_collection_if_exists(chroma_client, SHADOW_COLLECTION_NAME)
+        shadow = chroma_client.create_collection(
+            name=SHADOW_COLLECTION_NAME,
+            embedding_function=embedding_function
         )
+        insert_batch_size = 100
+        for i in range(0, len(documents), insert_batch_size):
+            batch_end = min(i + insert_batch_size, len(documents))
+            shadow.add(
+                documents=documents[i:batch_end],
+                metadatas=metadatas[i:batch_end],
+                embeddings=embeddings[i:batch_end],
+                ids=ids[i:batch_end]
+            )
+
+        delete_collection_if_exists(chroma_client, RETIRED_COLLECTION_NAME)
+        if live is not None:
+            live.modify(name=RETIRED_COLLECTION_NAME)
+        shadow.modify(name=COLLECTION_NAME)
+        print("🔁 Swapped rebuilt collection into place")
+
+    # Chroma and the embedding artifact hold exactly the same vectors
+    create_embeddings_artifact(ids, documents, metadatas, embeddings, embedding_function.model_name, artifact_path)
 
     print(f"🚀 Success! Created vector DB with {len(documents)} assessments")
     print(f"📁 ChromaDB stored at: {chroma_path}")
 
 if __name__ == "__main__":
-    create_vector_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the SHL assessment vector index")
+    parser.add_argument("--batch-size", type=int, default=64, help="Sentences per encoder batch")
+    parser.add_argument("--processes", type=int, default=0, help="Encoder processes (0 or 1 encodes in-process)")
+    args = parser.parse_args()
+    create_vector_db(batch_size=args.batch_size, processes=args.processes)
\ No newline at end of file
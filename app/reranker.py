@@ -0,0 +1,78 @@
+import math
+import threading
+import time
+
+from sentence_transformers import CrossEncoder
+
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """Second-stage re-ranking of retrieved candidates with a local cross-encoder on CPU.
+
+    Each call scores as many candidates as fit the time left before the
+    caller's deadline, estimated from the per-pair cost of earlier calls, in a
+    single forward pass. Candidates it had no time for keep their retrieval
+    order after the re-ranked ones.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL_NAME, max_length: int = 256):
+        self._model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.model_name = model_name
+        # Forward passes are serialised so they don't fight over the CPU
+        self._lock = threading.Lock()
+        self._seconds_per_pair = None
+
+    def score(self, query: str, documents: list) -> list:
+        start = time.perf_counter()
+        scores = self._model.predict(
+            [(query, document) for document in documents],
+            batch_size=max(len(documents), 1),
+            show_progress_bar=False
+        )
+        elapsed = (time.perf_counter() - start) / max(len(documents), 1)
+        # Moving average of the per-pair cost, used to size later calls
+        if self._seconds_per_pair is None:
+            self._seconds_per_pair = elapsed
+        else:
+            self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * elapsed
+        return [float(s) for s in scores]
+
+    def rerank(self, query: str, documents: list, first_stage_scores: list, deadline: float = None):
+        """Candidate positions in re-ranked order, their scores in [0, 1], and whether every candidate was scored.
+
+        Re-ranked candidates score the sigmoid of the cross-encoder logit.
+        Candidates left unscored keep their first-stage score, capped so the
+        scores never increase down the list. ``deadline`` is a
+        ``time.perf_counter()`` timestamp.
+        """
+        with self._lock:
+            count = len(documents)
+            if deadline is not None and self._seconds_per_pair:
+                remaining = deadline - time.perf_counter()
+                count = min(count, max(0, int(remaining / self._seconds_per_pair)))
+            if count < 2:
+                return list(range(len(documents))), list(first_stage_scores), len(documents) < 2
+
+            logits = self.score(query, documents[:count])
+        order = sorted(range(count), key=lambda i: logits[i], reverse=True)
+        scores = [1.0 / (1.0 + math.exp(-logits[i])) for i in order]
+        floor = scores[-1]
+        for i in range(count, len(documents)):
+            floor = min(floor, first_stage_scores[i])
+            scores.append(floor)
+        return order + list(range(count, len(documents))), scores, count == len(documents)
+
+    def warm_up(self, candidates: int):
+        # Also seeds the per-pair cost estimate at a realistic batch size
+        self.score("warm-up query", ["warm-up document"] * candidates)
+
+
+def select_results(results: dict, order: list, scores: list, n_results: int, row: int = 0) -> dict:
+    """Single-row, Chroma-shaped results holding ``row``'s hits in ``order`` with ``scores``, cut to ``n_results``"""
+    selected = {
+        key: [[results[key][row][i] for i in order[:n_results]]]
+        for key in ("ids", "metadatas", "documents", "distances")
+    }
+    selected["scores"] = [scores[:n_results]]
+    return selected
@@ -0,0 +1,284 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import chromadb
+import numpy as np
+from chromadb.errors import NotFoundError
+
+from app.cache import LRUCache
+from app.filters import matches
+from app.lexical import BM25Index, reciprocal_rank_fusion
+from app.rag import (
+    COLLECTION_NAME,
+    EMBEDDINGS_ARTIFACT_PATH,
+    EMBEDDINGS_ARTIFACT_VERSION,
+    ChromaEmbeddingFunction,
+    matrix_checksum,
+)
+
+CHROMA_PATH = os.path.join(os.path.dirname(__file__), "chroma_db")
+
+# Hybrid mode fuses this many dense and lexical candidates with RRF
+HYBRID_CANDIDATES = 50
+RRF_K = 60
+# How often the Chroma backend checks whether rag.py has swapped a rebuilt
+# collection in, and how it retries re-opening one that has gone missing
+COLLECTION_CHECK_SECONDS = float(os.getenv("COLLECTION_CHECK_SECONDS", "30"))
+REOPEN_ATTEMPTS = 4
+REOPEN_BACKOFF_SECONDS = 0.1
+
+
+class Corpus:
+    """In-memory view of the indexed documents: vectors, metadata, filter masks and the BM25 index"""
+
+    def __init__(self, ids, documents, metadatas, matrix):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.matrix = matrix
+        self.squared_norms = np.einsum("ij,ij->i", matrix, matrix)
+        self.position = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.lexical = BM25Index(self.documents)
+        # Boolean row masks per distinct where clause, built on first use
+        self._filter_masks = LRUCache(maxsize=256)
+
+    def filter_mask(self, where: dict) -> np.ndarray:
+        key = json.dumps(where, sort_keys=True)
+        mask = self._filter_masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches(where, metadata) for metadata in self.metadatas), dtype=bool, count=len(self.metadatas))
+            self._filter_masks.set(key, mask)
+        return mask
+
+    def squared_distances(self, queries: np.ndarray) -> np.ndarray:
+        # Squared L2, the same distance Chroma's default "l2" space reports
+        return (
+            self.squared_norms[None, :]
+            - 2.0 * (queries @ self.matrix.T)
+            + np.einsum("ij,ij->i", queries, queries)[:, None]
+        )
+
+    def results(self, rows, distances, scores=None) -> dict:
+        """Chroma-shaped query results for per-query lists of row indices"""
+        results = {"ids": [], "metadatas": [], "documents": [], "distances": []}
+        for row, indices in enumerate(rows):
+            results["ids"].append([self.ids[i] for i in indices])
+            results["metadatas"].append([self.metadatas[i] for i in indices])
+            results["documents"].append([self.documents[i] for i in indices])
+            results["distances"].append([float(distances[row, i]) for i in indices])
+        if scores is not None:
+            results["scores"] = scores
+        return results
+
+
+def similarity(distance: float, space: str = "l2") -> float:
+    """Cosine similarity of unit vectors from a Chroma distance, clamped to [0, 1].
+
+    "l2" distances are squared L2, which for unit vectors is 2 - 2cos; "cosine"
+    and "ip" distances are 1 - cos. Opposed vectors score 0, same direction 1.
+    """
+    cosine = 1.0 - distance / 2.0 if space == "l2" else 1.0 - distance
+    return max(0.0, min(1.0, cosine))
+
+
+class Retriever(ABC):
+    """Common query path; backends provide the corpus and the dense top-k"""
+
+    embedding_function: ChromaEmbeddingFunction
+    corpus: Corpus
+    # Distance metric of the index, as Chroma's "hnsw:space" names it
+    space: str = "l2"
+    # Called after the backend re-opens a rebuilt index, e.g. to drop cached responses
+    on_reopen = None
+
+    def embed(self, texts):
+        return self.embedding_function(texts)
+
+    @abstractmethod
+    def dense_query(self, query_embeddings, n_results: int, where: dict = None) -> dict:
+        """Chroma-shaped top-``n_results`` hits for each query embedding"""
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None,
+              query_texts: list = None, hybrid: bool = False):
+        """Chroma-shaped results plus "scores" in [0, 1] that follow the ranking, higher is better.
+
+        Dense scores are cosine similarities; hybrid scores are the normalised
+        fused RRF scores.
+        """
+        if hybrid and query_texts is not None:
+            return self.hybrid_query(query_embeddings, query_texts, n_results, where)
+        results = dict(self.dense_query(query_embeddings, n_results, where))
+        results["scores"] = [
+            [similarity(distance, self.space) for distance in row]
+            for row in results["distances"]
+        ]
+        return results
+
+    def hybrid_query(self, query_embeddings, query_texts: list, n_results: int, where: dict = None):
+        """Reciprocal rank fusion of the dense top-k and the BM25 top-k"""
+        dense = self.dense_query(query_embeddings, max(n_results, HYBRID_CANDIDATES), where)
+        corpus = self.corpus
+        mask = corpus.filter_mask(where) if where else None
+
+        rows, scores = [], []
+        for row, query_text in enumerate(query_texts):
+            dense_ranking = [corpus.position[doc_id] for doc_id in dense["ids"][row] if doc_id in corpus.position]
+            lexical_ranking = [i for i, _ in corpus.lexical.search(query_text, HYBRID_CANDIDATES, mask)]
+            fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking], RRF_K)[:n_results]
+            rows.append([index for index, _ in fused])
+            scores.append([score for _, score in fused])
+
+        # Lexical-only hits have no dense distance yet, so compute them all here
+        distances = corpus.squared_distances(np.asarray(query_embeddings, dtype=np.float32))
+        return corpus.results(rows, distances, scores)
+
+    def count(self) -> int:
+        return len(self.corpus.ids)
+
+    def warm_up(self):
+        self.query(self.embed(["warm-up query"]), n_results=1, query_texts=["warm-up query"], hybrid=True)
+
+
+class ChromaRetriever(Retriever):
+    """Holds the opened collection and the query-side embedding model for the life of the process"""
+
+    def __init__(self, path: str = CHROMA_PATH, embedding_function: ChromaEmbeddingFunction = None):
+        # Queries are embedded here with the same embedding function the index
+        # was built with and passed to Chroma as query_embeddings
+        self.embedding_function = embedding_function or ChromaEmbeddingFunction()
+        self.client = chromadb.PersistentClient(path=path)
+        self._reopen_lock = threading.Lock()
+        try:
+            self._open_collection(self.client.get_collection(COLLECTION_NAME))
+        except (NotFoundError, ValueError):
+            raise RuntimeError(f"Vector DB not initialized at {path}, run python -m app.rag first")
+
+    def _open_collection(self, collection):
+        stored = collection.get(include=["documents", "metadatas", "embeddings"])
+        self.corpus = Corpus(
+            stored["ids"],
+            stored["documents"],
+            stored["metadatas"],
+            np.asarray(stored["embeddings"], dtype=np.float32)
+        )
+        self.space = (collection.metadata or {}).get("hnsw:space", "l2")
+        self.collection = collection
+        self._next_check = time.monotonic() + COLLECTION_CHECK_SECONDS
+
+    def _reopen(self, stale):
+        """Re-resolve the collection name, unless another thread already replaced ``stale``"""
+        with self._reopen_lock:
+            if self.collection is not stale:
+                return
+            # rag.py renames the live collection away before renaming the
+            # rebuilt one in, so the name can briefly resolve to nothing
+            for attempt in range(REOPEN_ATTEMPTS):
+                try:
+                    collection = self.client.get_collection(COLLECTION_NAME)
+                    break
+                except (NotFoundError, ValueError):
+                    if attempt == REOPEN_ATTEMPTS - 1:
+                        raise
+                    time.sleep(REOPEN_BACKOFF_SECONDS * 2 ** attempt)
+            self._open_collection(collection)
+        print(f"🔁 Re-opened collection {COLLECTION_NAME} ({self.count()} assessments)")
+        if self.on_reopen is not None:
+            self.on_reopen()
+
+    def _check_for_rebuild(self):
+        collection = self.collection
+        self._next_check = time.monotonic() + COLLECTION_CHECK_SECONDS
+        try:
+            swapped = self.client.get_collection(COLLECTION_NAME).id != collection.id
+        except (NotFoundError, ValueError):
+            return  # mid-swap; the current collection stays readable until the next build
+        if swapped:
+            self._reopen(collection)
+
+    def dense_query(self, query_embeddings, n_results: int, where: dict = None):
+        if time.monotonic() >= self._next_check:
+            self._check_for_rebuild()
+        collection = self.collection
+        try:
+            return self._query(collection, query_embeddings, n_results, where)
+        except NotFoundError:
+            # The collection we hold was dropped: rag.py deletes the retired
+            # one at the start of the next build
+            self._reopen(collection)
+            return self._query(self.collection, query_embeddings, n_results, where)
+
+    def _query(self, collection, query_embeddings, n_results: int, where: dict = None):
+        return collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=["metadatas", "documents", "distances"]
+        )
+
+
+class NumpyRetriever(Retriever):
+    """Exact top-k over the memory-mapped embedding artifact; returns Chroma-shaped query results.
+
+    Boots without Chroma: only the query embedding model is loaded, and it must
+    match the model (and dimension) the artifact was built with.
+    """
+
+    def __init__(self, path: str = EMBEDDINGS_ARTIFACT_PATH, embedding_function: ChromaEmbeddingFunction = None):
+        if not os.path.exists(path + ".npy") or not os.path.exists(path + ".json"):
+            raise RuntimeError(f"Embedding artifact not found at {path}, run python -m app.rag first")
+
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != EMBEDDINGS_ARTIFACT_VERSION:
+            raise RuntimeError(f"Unsupported embedding artifact version {manifest.get('format_version')}")
+
+        matrix = np.load(path + ".npy", mmap_mode="r")
+        if matrix.shape != (manifest["count"], manifest["dimension"]) or matrix_checksum(matrix) != manifest["checksum"]:
+            raise RuntimeError("Embedding artifact is corrupt: matrix does not match its manifest")
+
+        self.embedding_function = embedding_function or ChromaEmbeddingFunction(model_name=manifest["model_name"])
+        if self.embedding_function.model_name != manifest["model_name"]:
+            raise RuntimeError(
+                f"Embedding artifact was built with {manifest['model_name']}, "
+                f"but queries use {self.embedding_function.model_name}"
+            )
+        if self.embedding_function.dimension() != manifest["dimension"]:
+            raise RuntimeError("Embedding artifact dimension does not match the query model")
+
+        self.corpus = Corpus(manifest["ids"], manifest["documents"], manifest["metadatas"], matrix)
+
+    def dense_query(self, query_embeddings, n_results: int, where: dict = None):
+        corpus = self.corpus
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        mask = corpus.filter_mask(where) if where else None
+        k = min(n_results, len(corpus.ids) if mask is None else int(mask.sum()))
+        if k == 0:
+            return corpus.results([[] for _ in queries], None)
+
+        distances = corpus.squared_distances(queries)
+        if mask is not None:
+            distances[:, ~mask] = np.inf
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return corpus.results(top, distances)
+
+
+RETRIEVER_BACKENDS = {
+    "chroma": ChromaRetriever,
+    "numpy": NumpyRetriever,
+}
+
+
+def load_retriever(backend: str = "chroma"):
+    if backend not in RETRIEVER_BACKENDS:
+        raise ValueError(f"Unknown retriever backend '{backend}', expected one of {sorted(RETRIEVER_BACKENDS)}")
+
+    start = time.perf_counter()
+    retriever = RETRIEVER_BACKENDS[backend]()
+    retriever.warm_up()
+    print(f"✅ {backend} retriever ready in {time.perf_counter() - start:.1f}s ({retriever.count()} assessments)")
+    return retriever
@@ -0,0 +1,61 @@
+"""
+Microbenchmark for detail-page parsing
+Times extract_assessment_fields() per page over saved HTML fixtures with each
+available parser backend. Fixtures default to the detail pages in
+benchmarks/fixtures; pass another directory (e.g. data/http_cache/bodies after
+a scrape) to time real pages.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app.extract as extract
+from benchmarks.common import latency_summary
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+REPEATS = 5
+
+
+def load_fixtures(fixtures_dir: Path) -> list:
+    return [path.read_text(encoding="utf-8", errors="ignore") for path in sorted(fixtures_dir.glob("*.html"))]
+
+
+def time_backend(pages: list) -> list:
+    """Return per-page parse times in milliseconds"""
+    timings = []
+    for _ in range(REPEATS):
+        for html in pages:
+            start = time.perf_counter()
+            extract.extract_assessment_fields(html)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    fixtures_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else FIXTURES_DIR
+    pages = load_fixtures(fixtures_dir)
+    if not pages:
+        print(f"❌ No .html fixtures found in {fixtures_dir}")
+        return
+    print(f"✅ Loaded {len(pages)} HTML fixtures from {fixtures_dir}")
+
+    backends = {"html.parser": None}
+    if extract.lxml is not None:
+        backends = {"lxml": extract.lxml, **backends}
+
+    print(f"\n{'backend':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    lxml_module = extract.lxml
+    try:
+        for name, module in backends.items():
+            extract.lxml = module
+            stats = latency_summary(time_backend(pages))
+            print(f"{name:<12} {stats['p50_ms']:>8.3f} {stats['p95_ms']:>8.3f} "
+                  f"{stats['p99_ms']:>8.3f} {stats['mean_ms']:>8.3f}")
+    finally:
+        extract.lxml = lxml_module
+
+
+if __name__ == "__main__":
+    main()
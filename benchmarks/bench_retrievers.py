@@ -0,0 +1,52 @@
+"""
+Benchmark the Chroma and NumPy retriever backends
+Checks both return the same result lists and compares query latency
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.rag import ChromaEmbeddingFunction
+from app.retriever import ChromaRetriever, NumpyRetriever
+from benchmarks.common import QUERIES, latency_summary
+
+REPEATS = 50
+N_RESULTS = 10
+
+
+def time_queries(retriever, embeddings) -> list:
+    """Return per-query latencies in milliseconds"""
+    latencies = []
+    for _ in range(REPEATS):
+        for embedding in embeddings:
+            start = time.perf_counter()
+            retriever.query([embedding], n_results=N_RESULTS)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    embedding_function = ChromaEmbeddingFunction()
+    backends = {
+        "chroma": ChromaRetriever(embedding_function=embedding_function),
+        "numpy": NumpyRetriever(embedding_function=embedding_function),
+    }
+    embeddings = embedding_function(QUERIES)
+
+    # Result lists must match before latency numbers mean anything
+    chroma_ids = backends["chroma"].query(embeddings, n_results=N_RESULTS)["ids"]
+    numpy_ids = backends["numpy"].query(embeddings, n_results=N_RESULTS)["ids"]
+    mismatches = sum(1 for a, b in zip(chroma_ids, numpy_ids) if a != b)
+    print(f"🔍 Identical result lists: {len(QUERIES) - mismatches}/{len(QUERIES)}")
+
+    print(f"\n{'backend':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, retriever in backends.items():
+        retriever.warm_up()
+        stats = latency_summary(time_queries(retriever, embeddings))
+        print(f"{name:<8} {stats['p50_ms']:>8.3f} {stats['p95_ms']:>8.3f} {stats['p99_ms']:>8.3f} {stats['mean_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmark the /recommend serving path offline
+Times each stage of recommend() (embedding, vector query, result assembly, JD
+scraping against a local fixture server) and the whole request with Gemini
+stubbed, at several concurrency levels, plus create_vector_db() build time.
+Results can be saved as a JSON baseline; later runs flag regressions against it.
+"""
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+import app.api as api
+from app.jd_fetcher import JobDescriptionFetcher
+from app.rag import create_vector_db
+from benchmarks.common import QUERIES, latency_summary
+
+BASELINE_PATH = ROOT / "benchmarks" / "baselines" / "bench_serving.json"
+
+JD_FIXTURE = (
+    "<html><head><title>Job</title></head><body><nav>" + "<a href='#'>link</a>" * 200 + "</nav>"
+    "<div class='job-description'><h2>About the role</h2>"
+    + "<p>We are hiring a Java developer who collaborates with business teams and owns delivery.</p>" * 20
+    + "</div><footer>" + "<p>footer</p>" * 100 + "</footer></body></html>"
+).encode()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(JD_FIXTURE)))
+        self.end_headers()
+        self.wfile.write(JD_FIXTURE)
+
+    def log_message(self, *args):
+        pass
+
+
+def summarize(latencies: list, wall: float) -> dict:
+    """Latency percentiles in milliseconds and throughput in calls per second"""
+    return {**latency_summary(latencies), "qps": len(latencies) / wall}
+
+
+def run_threaded(fn, inputs: list, concurrency: int) -> dict:
+    def timed(item):
+        start = time.perf_counter()
+        fn(item)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(timed, inputs))
+        wall = time.perf_counter() - start
+    return summarize(latencies, wall)
+
+
+async def run_async(fn, inputs: list, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(item):
+        async with semaphore:
+            start = time.perf_counter()
+            await fn(item)
+            return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(timed(item) for item in inputs))
+    wall = time.perf_counter() - start
+    return summarize(latencies, wall)
+
+
+async def stub_insights(description: str) -> str:
+    return "Stubbed insight"
+
+
+async def bench_stages(requests_per_level: int, levels: list) -> dict:
+    # Gemini is never called: /recommend gets a constant insight instead
+    api.generate_gemini_insights_async = stub_insights
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    jd_url = f"http://127.0.0.1:{server.server_address[1]}/job"
+
+    results = {}
+    async with api.lifespan(api.app):
+        while api.app.state.retriever is None:
+            if api.app.state.retriever_error:
+                raise RuntimeError(api.app.state.retriever_error)
+            await asyncio.sleep(0.05)
+        retriever = api.app.state.retriever
+        texts = [QUERIES[i % len(QUERIES)] for i in range(requests_per_level)]
+        embeddings = [retriever.embed([text])[0] for text in QUERIES]
+        vectors = [embeddings[i % len(QUERIES)] for i in range(requests_per_level)]
+        query_results = retriever.query(embeddings[:1], api.N_RESULTS)
+        # No caching and no revalidation: every call goes over the socket
+        fetcher = JobDescriptionFetcher(ttl=0)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench")
+
+        async def recommend(i):
+            # A distinct text per call, so neither the response nor the embedding cache answers
+            text = f"{QUERIES[i % len(QUERIES)]} ({i})"
+            response = await client.post("/recommend", json={"text": text, "use_ai": True})
+            response.raise_for_status()
+
+        stages = {
+            "embedding": lambda level: run_threaded(lambda text: retriever.embed([text]), texts, level),
+            "vector_query": lambda level: run_threaded(
+                lambda vector: retriever.query([vector], api.N_RESULTS), vectors, level),
+            "hybrid_query": lambda level: run_threaded(
+                lambda i: retriever.query([vectors[i]], api.N_RESULTS, None, [texts[i]], True),
+                range(requests_per_level), level),
+            "result_assembly": lambda level: run_threaded(
+                lambda _: api.build_recommendations(query_results), range(requests_per_level), level),
+        }
+        for name, run in stages.items():
+            results[name] = {str(level): run(level) for level in levels}
+            print(f"✅ {name}")
+
+        results["jd_scraping"] = {
+            str(level): await run_async(lambda _: fetcher.fetch(jd_url), range(requests_per_level), level)
+            for level in levels
+        }
+        print("✅ jd_scraping")
+        results["recommend"] = {}
+        for level in levels:
+            offset = level * requests_per_level
+            results["recommend"][str(level)] = await run_async(
+                lambda i: recommend(offset + i), range(requests_per_level), level)
+        print("✅ recommend")
+
+        await client.aclose()
+        await fetcher.aclose()
+    server.shutdown()
+    return results
+
+
+def bench_index_build() -> dict:
+    """Full build into an empty directory, then the incremental no-op rebuild"""
+    workdir = Path(tempfile.mkdtemp(prefix="bench_index_"))
+    try:
+        paths = {
+            "chroma_path": str(workdir / "chroma_db"),
+            "json_path": str(ROOT / "data" / "shl_assessments_complete.json"),
+            "artifact_path": str(workdir / "embeddings"),
+        }
+        timings = {}
+        for name in ("full", "incremental"):
+            start = time.perf_counter()
+            create_vector_db(**paths)
+            timings[name] = {"seconds": time.perf_counter() - start}
+        return timings
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list:
+    """Stages slower (p95, seconds) or with lower QPS than the baseline by more than ``threshold``"""
+    regressions = []
+    for stage, levels in results.items():
+        for level, current in levels.items():
+            previous = baseline.get(stage, {}).get(level)
+            if previous is None:
+                continue
+            for metric in ("p95_ms", "seconds"):
+                if metric in current and current[metric] > previous[metric] * (1 + threshold):
+                    regressions.append(f"{stage} [{level}] {metric} {previous[metric]:.2f} -> {current[metric]:.2f}")
+            if "qps" in current and current["qps"] < previous["qps"] * (1 - threshold):
+                regressions.append(f"{stage} [{level}] qps {previous['qps']:.1f} -> {current['qps']:.1f}")
+    return regressions
+
+
+def print_report(results: dict):
+    print(f"\n{'stage':<16} {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'qps':>9}")
+    for stage, levels in results.items():
+        for level, stats in levels.items():
+            if "seconds" in stats:
+                print(f"{stage:<16} {level:>5} {'build ' + format(stats['seconds'], '.2f') + 's':>39}")
+                continue
+            print(f"{stage:<16} {level:>5} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} "
+                  f"{stats['p99_ms']:>9.3f} {stats['qps']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /recommend serving path")
+    parser.add_argument("--requests", type=int, default=200, help="calls per stage and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--skip-build", action="store_true", help="don't time create_vector_db()")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench_stages(args.requests, args.concurrency))
+    if not args.skip_build:
+        results["index_build"] = bench_index_build()
+    print_report(results)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\n📝 No baseline at {args.baseline}, rerun with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"   {regression}")
+        sys.exit(1)
+    print(f"\n✅ No regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
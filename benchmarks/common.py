@@ -0,0 +1,27 @@
+"""
+Shared benchmark inputs and latency statistics
+"""
+import numpy as np
+
+# Job-description style queries every benchmark runs, so their numbers compare
+QUERIES = [
+    "Senior Java developer with strong team collaboration and stakeholder management skills",
+    "Mid-level data analyst proficient in Python, SQL, and data visualization tools",
+    "Entry-level customer service representative with excellent communication and problem-solving abilities",
+    "Project manager with 5+ years experience in agile methodologies and cross-functional team leadership",
+    "Financial analyst requiring strong analytical thinking, Excel proficiency, and attention to detail",
+    "Software architect with expertise in microservices and cloud-native applications",
+    "Marketing manager with digital marketing and campaign management experience",
+    "HR specialist with talent acquisition and employee relations skills",
+]
+
+
+def latency_summary(latencies: list) -> dict:
+    """p50/p95/p99 and mean of latencies in milliseconds"""
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(np.mean(latencies))
+    }
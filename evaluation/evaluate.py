@@ -1,16 +1,39 @@
 """
 Evaluation script for SHL Assessment Recommender
-Calculates Mean Recall@K metrics on train data
+Calculates Mean Recall@K, MAP@K, nDCG@K and MRR on train data, plus latency percentiles
+
+Each distinct query is fetched once, concurrently, and every K is scored from
+that single result list. Fetched results are checkpointed to a JSONL file so an
+interrupted run resumes where it stopped. --local queries the retriever in
+app/ in-process instead of going through the API.
 """
+import argparse
 import json
-import requests
-import pandas as pd
-from typing import List, Dict
+import os
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict
+
+import numpy as np
+import pandas as pd
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.clients import load_local_retriever, pooled_session
 
 # Configuration
-API_URL = "https://shl-assessment-recommender-8awb.onrender.com/recommend"
-TRAIN_DATA_PATH = "../data/Gen_AI Dataset.xlsx"
+API_URL = os.getenv("EVAL_API_URL", "https://shl-assessment-recommender-8awb.onrender.com")
+EVAL_DIR = Path(__file__).resolve().parent
+TRAIN_DATA_PATH = EVAL_DIR.parent / "data" / "Gen_AI Dataset.xlsx"
+CHECKPOINT_PATH = EVAL_DIR / "evaluation_checkpoint.jsonl"
+DETAILS_PATH = EVAL_DIR / "evaluation_details.json"
+K_VALUES = [5, 10]
+# /recommend returns its top 10; larger K needs --local
+API_MAX_K = 10
 
 def load_train_data() -> pd.DataFrame:
     """Load training data from Excel file"""
@@ -21,175 +44,315 @@ def load_train_data() -> pd.DataFrame:
         return df
     except Exception as e:
         print(f"❌ Error loading train data: {e}")
-        print("📝 Please ensure Gen_AI Dataset.xlsx is in the parent directory")
+        print(f"📝 Please ensure Gen_AI Dataset.xlsx is at {TRAIN_DATA_PATH}")
         return None
 
-def get_recommendations(query: str, use_ai: bool = False) -> List[Dict]:
-    """Get recommendations from API"""
-    try:
-        response = requests.post(
-            API_URL,
-            json={"text": query, "use_ai": use_ai},
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"⚠️ API Error for query '{query[:50]}...': {e}")
-        return []
-
-def calculate_recall_at_k(predicted_urls: List[str], relevant_urls: List[str], k: int = 10) -> float:
-    """
-    Calculate Recall@K metric
-    
-    Recall@K = (Number of relevant items in top K) / (Total relevant items)
-    """
-    if not relevant_urls:
-        return 0.0
-    
-    # Get top K predictions
-    top_k_predictions = predicted_urls[:k]
-    
-    # Count how many relevant items are in top K
-    relevant_in_top_k = sum(1 for url in top_k_predictions if url in relevant_urls)
-    
-    # Calculate recall
-    recall = relevant_in_top_k / len(relevant_urls)
-    
-    return recall
+def url_key(url: str) -> str:
+    """Assessment slug, so /solutions/products/... and /products/... catalog URLs compare equal"""
+    return url.strip().rstrip("/").rsplit("/", 1)[-1].lower()
 
-def evaluate_system(df: pd.DataFrame, k: int = 10) -> Dict:
-    """
-    Evaluate the recommendation system on train data
-    
-    Returns:
-        Dictionary with evaluation metrics
-    """
-    recalls = []
-    results = []
-    
-    print(f"\n🔍 Evaluating system with Recall@{k}...\n")
-    
+def group_relevance(df: pd.DataFrame) -> Dict[str, set]:
+    """Collapse the one-URL-per-row train sheet into a relevance set per query"""
+    relevant = {}
     for idx, row in df.iterrows():
         query = row.get('Query', row.get('query', ''))
         relevant_url = row.get('Assessment_url', row.get('assessment_url', ''))
-        
-        if not query or not relevant_url:
+        if not isinstance(query, str) or not isinstance(relevant_url, str) or not query or not relevant_url:
             print(f"⚠️ Skipping row {idx}: Missing query or URL")
             continue
-        
-        # Get recommendations
-        recommendations = get_recommendations(query, use_ai=False)
-        
-        if not recommendations:
-            print(f"❌ No recommendations for: {query[:50]}...")
-            recalls.append(0.0)
-            continue
-        
-        # Extract predicted URLs
-        predicted_urls = [rec['url'] for rec in recommendations]
-        
-        # For train data, we might have multiple relevant URLs per query
-        # If the data has one URL per row, we'll treat it as a list of one
-        relevant_urls = [relevant_url] if isinstance(relevant_url, str) else relevant_url
-        
-        # Calculate recall
-        recall = calculate_recall_at_k(predicted_urls, relevant_urls, k)
-        recalls.append(recall)
-        
-        # Store result
-        results.append({
-            'query': query,
-            'relevant_urls': relevant_urls,
-            'predicted_urls': predicted_urls[:k],
-            'recall': recall
-        })
-        
-        print(f"Query {idx+1}/{len(df)}: Recall@{k} = {recall:.3f} | {query[:50]}...")
-        
-        # Small delay to avoid overwhelming API
-        time.sleep(0.5)
-    
-    # Calculate mean recall
-    mean_recall = sum(recalls) / len(recalls) if recalls else 0.0
+        relevant.setdefault(query, set()).add(url_key(relevant_url))
+    return relevant
+
+class Checkpoint:
+    """Append-only JSONL of fetched result lists, keyed by query and run configuration"""
+
+    def __init__(self, path: Path, config: Dict, resume: bool = True):
+        self.path = path
+        self.config = config
+        self.results = {}
+        self._lock = threading.Lock()
+        if resume and path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut off by an interrupted run
+                    if record.get("config") == config:
+                        self.results[record["query"]] = record
+        elif path.exists():
+            path.unlink()
+
+    def save(self, query: str, predicted_urls: List[str], latency_ms: float, server_ms: float = None):
+        record = {
+            "config": self.config,
+            "query": query,
+            "predicted_urls": predicted_urls,
+            "latency_ms": latency_ms,
+            "server_ms": server_ms
+        }
+        with self._lock:
+            self.results[query] = record
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+def server_time_ms(response: requests.Response):
+    """The "total" entry of the API's Server-Timing header, in milliseconds"""
+    for metric in response.headers.get("Server-Timing", "").split(","):
+        name, _, params = metric.strip().partition(";")
+        if name == "total" and params.startswith("dur="):
+            return float(params[4:])
+    return None
+
+def get_recommendations(session: requests.Session, query: str, api_url: str = API_URL, hybrid: bool = False):
+    """Get recommended URLs for one query from the API, with end-to-end and server latency"""
+    start = time.perf_counter()
+    response = session.post(
+        f"{api_url}/recommend",
+        json={"text": query, "use_ai": False, "hybrid": hybrid},
+        timeout=60
+    )
+    response.raise_for_status()
+    urls = [rec['url'] for rec in response.json()]
+    return urls, (time.perf_counter() - start) * 1000, server_time_ms(response)
+
+def fetch_remote(queries: List[str], checkpoint: Checkpoint, api_url: str, hybrid: bool, concurrency: int):
+    """Fetch queries from the API with at most ``concurrency`` requests in flight"""
+    session = pooled_session(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(get_recommendations, session, query, api_url, hybrid): query for query in queries}
+        for done, future in enumerate(as_completed(futures), 1):
+            query = futures[future]
+            try:
+                checkpoint.save(query, *future.result())
+                print(f"Query {done}/{len(queries)} fetched | {query[:50]}...")
+            except Exception as e:
+                # Not checkpointed, so a resumed run retries it
+                print(f"⚠️ API Error for query '{query[:50]}...': {e}")
+    session.close()
+
+def fetch_local(queries: List[str], checkpoint: Checkpoint, max_k: int, hybrid: bool):
+    """Query the retriever in-process, one query at a time so each gets its own latency"""
+    retriever = load_local_retriever()
+    for done, query in enumerate(queries, 1):
+        start = time.perf_counter()
+        embeddings = retriever.embed([query])
+        results = retriever.query(embeddings, max_k, None, [query], hybrid)
+        latency_ms = (time.perf_counter() - start) * 1000
+        checkpoint.save(query, [metadata["url"] for metadata in results["metadatas"][0]], latency_ms)
+        print(f"Queries {done}/{len(queries)} fetched")
+
+def relevance_matrix(predictions: List[List[str]], relevant: List[set], max_k: int):
+    """Binary (queries x max_k) hit matrix and the number of relevant items per query"""
+    hits = np.zeros((len(predictions), max_k), dtype=np.float64)
+    for i, (predicted_urls, relevant_keys) in enumerate(zip(predictions, relevant)):
+        for j, url in enumerate(predicted_urls[:max_k]):
+            hits[i, j] = url_key(url) in relevant_keys
+    n_relevant = np.array([len(r) for r in relevant], dtype=np.float64)
+    return hits, n_relevant
+
+def ranking_metrics(hits: np.ndarray, n_relevant: np.ndarray, k: int) -> Dict[str, np.ndarray]:
+    """Per-query Recall@K, AP@K and nDCG@K, computed for all queries at once"""
+    top = hits[:, :k]
+    ranks = np.arange(1, k + 1)
+    ideal_hits = np.minimum(n_relevant, k)
+
+    recall = top.sum(axis=1) / np.maximum(n_relevant, 1)
+
+    # AP@K: precision at each relevant rank, averaged over min(|relevant|, K)
+    precision = np.cumsum(top, axis=1) / ranks
+    average_precision = (precision * top).sum(axis=1) / np.maximum(ideal_hits, 1)
+
+    discounts = 1.0 / np.log2(ranks + 1)
+    dcg = (top * discounts).sum(axis=1)
+    ideal_dcg = np.concatenate([[0.0], np.cumsum(discounts)])[ideal_hits.astype(int)]
+    ndcg = np.divide(dcg, ideal_dcg, out=np.zeros_like(dcg), where=ideal_dcg > 0)
+
+    return {"recall": recall, "average_precision": average_precision, "ndcg": ndcg}
+
+def reciprocal_ranks(hits: np.ndarray) -> np.ndarray:
+    """1 / rank of the first relevant result, 0 when none was returned"""
+    found = hits.any(axis=1)
+    return np.where(found, 1.0 / (hits.argmax(axis=1) + 1), 0.0)
+
+def latency_summary(values: List[float]) -> Dict:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "mean_ms": float(np.mean(values)), "count": len(values)}
+
+def evaluate_system(relevant: Dict[str, set], predictions: Dict[str, Dict], k_values: List[int]) -> Dict:
+    """
+    Evaluate the recommendation system on train data, one relevance set per query
     
-    metrics = {
-        'mean_recall_at_k': mean_recall,
-        'k': k,
-        'num_queries': len(recalls),
-        'individual_recalls': recalls,
-        'detailed_results': results
+    Returns:
+        Dictionary with metrics per K, MRR, latency percentiles and per-query detail
+    """
+    queries = list(relevant)
+    missing = [q for q in queries if q not in predictions]
+    for query in missing:
+        print(f"❌ No recommendations for: {query[:50]}...")
+
+    predicted = [predictions[q]["predicted_urls"] if q in predictions else [] for q in queries]
+    hits, n_relevant = relevance_matrix(predicted, [relevant[q] for q in queries], max(k_values))
+    per_k = {k: ranking_metrics(hits, n_relevant, k) for k in k_values}
+    mrr = reciprocal_ranks(hits)
+
+    details = []
+    for i, query in enumerate(queries):
+        record = predictions.get(query, {})
+        details.append({
+            "query": query,
+            "relevant": sorted(relevant[query]),
+            "predicted_urls": predicted[i],
+            "reciprocal_rank": float(mrr[i]),
+            "latency_ms": record.get("latency_ms"),
+            "server_ms": record.get("server_ms"),
+            **{
+                f"{name}@{k}": float(values[i])
+                for k, metrics in per_k.items()
+                for name, values in metrics.items()
+            }
+        })
+
+    return {
+        "num_queries": len(queries),
+        "num_missing": len(missing),
+        "mrr": float(mrr.mean()) if len(queries) else 0.0,
+        "at_k": {
+            k: {
+                "mean_recall": float(m["recall"].mean()) if len(queries) else 0.0,
+                "map": float(m["average_precision"].mean()) if len(queries) else 0.0,
+                "ndcg": float(m["ndcg"].mean()) if len(queries) else 0.0,
+                "min_recall": float(m["recall"].min()) if len(queries) else 0.0,
+                "max_recall": float(m["recall"].max()) if len(queries) else 0.0
+            }
+            for k, m in per_k.items()
+        },
+        "latency": {
+            "end_to_end": latency_summary([d["latency_ms"] for d in details]),
+            "server": latency_summary([d["server_ms"] for d in details])
+        },
+        "detailed_results": details
     }
-    
-    return metrics
 
 def print_evaluation_report(metrics: Dict):
     """Print formatted evaluation report"""
     print("\n" + "="*60)
     print("📊 EVALUATION REPORT")
     print("="*60)
-    print(f"\n📈 Mean Recall@{metrics['k']}: {metrics['mean_recall_at_k']:.4f}")
-    print(f"📝 Number of Queries Evaluated: {metrics['num_queries']}")
-    print(f"\n📉 Recall Distribution:")
-    print(f"   Min: {min(metrics['individual_recalls']):.4f}")
-    print(f"   Max: {max(metrics['individual_recalls']):.4f}")
-    print(f"   Avg: {metrics['mean_recall_at_k']:.4f}")
-    
+    print(f"\n📝 Number of Queries Evaluated: {metrics['num_queries']} ({metrics['num_missing']} without results)")
+    for k, m in metrics["at_k"].items():
+        print(f"\n📈 @{k}: Recall {m['mean_recall']:.4f} | MAP {m['map']:.4f} | nDCG {m['ndcg']:.4f}"
+              f" | Recall min/max {m['min_recall']:.3f}/{m['max_recall']:.3f}")
+    print(f"\n🎯 MRR: {metrics['mrr']:.4f}")
+
+    for name, summary in metrics["latency"].items():
+        if summary:
+            print(f"⏱️ {name} latency: p50 {summary['p50_ms']:.1f}ms | p95 {summary['p95_ms']:.1f}ms"
+                  f" | p99 {summary['p99_ms']:.1f}ms ({summary['count']} queries)")
+
     # Show some examples
+    largest_k = max(metrics["at_k"])
     print(f"\n🔍 Sample Results (first 3):")
     for i, result in enumerate(metrics['detailed_results'][:3], 1):
         print(f"\n   Example {i}:")
         print(f"   Query: {result['query'][:60]}...")
-        print(f"   Recall@{metrics['k']}: {result['recall']:.3f}")
-        print(f"   Relevant: {len(result['relevant_urls'])} | Predicted: {len(result['predicted_urls'])}")
+        print(f"   Recall@{largest_k}: {result[f'recall@{largest_k}']:.3f} | RR: {result['reciprocal_rank']:.3f}")
+        print(f"   Relevant: {len(result['relevant'])} | Predicted: {len(result['predicted_urls'])}")
     
     print("\n" + "="*60)
 
-def save_evaluation_results(metrics: Dict, output_path: str = "evaluation_results.json"):
-    """Save evaluation results to JSON file"""
-    # Remove detailed results for cleaner output
-    summary = {
-        'mean_recall_at_k': metrics['mean_recall_at_k'],
-        'k': metrics['k'],
-        'num_queries': metrics['num_queries'],
-        'min_recall': min(metrics['individual_recalls']),
-        'max_recall': max(metrics['individual_recalls']),
-        'avg_recall': metrics['mean_recall_at_k']
-    }
-    
-    with open(output_path, 'w') as f:
-        json.dump(summary, f, indent=2)
-    
-    print(f"\n💾 Evaluation results saved to: {output_path}")
+def save_evaluation_results(metrics: Dict, output_dir: Path = EVAL_DIR):
+    """Save a summary per K plus the per-query detail"""
+    for k, m in metrics["at_k"].items():
+        summary = {
+            'mean_recall_at_k': m['mean_recall'],
+            'map_at_k': m['map'],
+            'ndcg_at_k': m['ndcg'],
+            'mrr': metrics['mrr'],
+            'k': k,
+            'num_queries': metrics['num_queries'],
+            'min_recall': m['min_recall'],
+            'max_recall': m['max_recall'],
+            'avg_recall': m['mean_recall'],
+            'latency': metrics['latency']
+        }
+        output_path = output_dir / f"evaluation_results_k{k}.json"
+        with open(output_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n💾 Evaluation results saved to: {output_path}")
+
+    with open(output_dir / DETAILS_PATH.name, 'w') as f:
+        json.dump(metrics["detailed_results"], f, indent=2)
+    print(f"💾 Per-query results saved to: {output_dir / DETAILS_PATH.name}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate the SHL Assessment Recommender on the train set")
+    parser.add_argument("--local", action="store_true", help="query the retriever in app/ in-process (no HTTP)")
+    parser.add_argument("--api-url", default=API_URL, help="API base URL for remote mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight in remote mode")
+    parser.add_argument("--k", type=int, nargs="+", default=K_VALUES, help="cutoffs to report")
+    parser.add_argument("--hybrid", action="store_true", help="fuse BM25 keyword hits with the dense results")
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH)
+    parser.add_argument("--fresh", action="store_true", help="discard the checkpoint instead of resuming from it")
+    return parser.parse_args()
 
 def main():
     """Main evaluation function"""
-    print("🚀 Starting SHL Assessment Recommender Evaluation\n")
-    
-    # Check if API is running
-    try:
-        health_response = requests.get("https://shl-assessment-recommender-8awb.onrender.com/health", timeout=5)
-        if health_response.status_code == 200:
-            print("✅ API is running and healthy\n")
-        else:
-            print("⚠️ API health check failed")
+    args = parse_args()
+    max_k = max(args.k)
+    print(f"🚀 Starting SHL Assessment Recommender Evaluation "
+          f"({'local' if args.local else args.api_url}, {'hybrid' if args.hybrid else 'dense'} retrieval)\n")
+
+    if not args.local:
+        if max_k > API_MAX_K:
+            print(f"❌ The API returns at most {API_MAX_K} results, use --local for K={max_k}")
+            return
+        # Check if API is running
+        try:
+            health_response = requests.get(f"{args.api_url}/health", timeout=5)
+            if health_response.status_code == 200:
+                print("✅ API is running and healthy\n")
+            else:
+                print("⚠️ API health check failed")
+                return
+        except Exception as e:
+            print(f"❌ Cannot connect to API at {args.api_url}")
+            print("Please ensure the API is deployed and accessible")
             return
-    except Exception as e:
-        print(f"❌ Cannot connect to API at {API_URL}")
-        print("Please ensure the API is deployed and accessible")
-        return
     
     # Load train data
     df = load_train_data()
     if df is None:
         return
-    
-    # Evaluate at different K values
-    for k in [5, 10]:
-        metrics = evaluate_system(df, k=k)
-        print_evaluation_report(metrics)
-        save_evaluation_results(metrics, f"evaluation_results_k{k}.json")
-        print("\n" + "-"*60 + "\n")
+
+    config = {
+        "mode": "local" if args.local else args.api_url,
+        "hybrid": args.hybrid,
+        "max_k": max_k
+    }
+    checkpoint = Checkpoint(args.checkpoint, config, resume=not args.fresh)
+    relevant = group_relevance(df)
+    print(f"🗂️ {len(df)} rows grouped into {len(relevant)} queries")
+    queries = [q for q in relevant if q not in checkpoint.results]
+    if checkpoint.results:
+        print(f"♻️ Resuming: {len(checkpoint.results)} queries already in {args.checkpoint}")
+
+    # Every query is fetched once; all K are scored from the same list
+    start = time.perf_counter()
+    if queries:
+        if args.local:
+            fetch_local(queries, checkpoint, max_k, args.hybrid)
+        else:
+            fetch_remote(queries, checkpoint, args.api_url, args.hybrid, args.concurrency)
+    print(f"\n⏱️ Fetched {len(queries)} queries in {time.perf_counter() - start:.1f}s")
+
+    metrics = evaluate_system(relevant, checkpoint.results, sorted(args.k))
+    print_evaluation_report(metrics)
+    save_evaluation_results(metrics)
 
 if __name__ == "__main__":
     main()
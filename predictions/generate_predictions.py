@@ -1,17 +1,36 @@
 """
 Generate test predictions for SHL Assessment Recommender
 Creates CSV file in required format: firstname_lastname.csv
+
+Identical queries are fetched once. Queries go to the API's /recommend/batch
+endpoint, several batches in flight, or with --local straight to the retriever
+in app/. Rows are appended to the CSV as each query completes, so an
+interrupted run resumes from the partially written file.
 """
-import json
-import requests
-import pandas as pd
-from typing import List, Dict
+import argparse
+import csv
+import os
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict
+
+import pandas as pd
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.clients import fetch_job_descriptions, load_local_retriever, pooled_session
 
 # Configuration
-API_URL = "https://shl-assessment-recommender-8awb.onrender.com/recommend"
-TEST_DATA_PATH = "../data/Gen_AI Dataset.xlsx"
-OUTPUT_CSV = "abhay_gupta.csv"
+API_URL = os.getenv("PREDICT_API_URL", "https://shl-assessment-recommender-8awb.onrender.com")
+PRED_DIR = Path(__file__).resolve().parent
+TEST_DATA_PATH = PRED_DIR.parent / "data" / "Gen_AI Dataset.xlsx"
+OUTPUT_CSV = PRED_DIR / "abhay_gupta.csv"
+MAX_RESULTS = 10
+CSV_COLUMNS = ['Query', 'Assessment_url']
 
 def load_test_data() -> pd.DataFrame:
     """Load test data from Excel file"""
@@ -22,86 +41,122 @@ def load_test_data() -> pd.DataFrame:
         return df
     except Exception as e:
         print(f"❌ Error loading test data: {e}")
-        print("📝 Please ensure Gen_AI Dataset.xlsx is in the parent directory")
+        print(f"📝 Please ensure Gen_AI Dataset.xlsx is at {TEST_DATA_PATH}")
         return None
 
-def get_recommendations(query: str, use_ai: bool = False, max_results: int = 10) -> List[Dict]:
-    """Get recommendations from API"""
-    try:
-        response = requests.post(
-            API_URL,
-            json={"text": query, "use_ai": use_ai},
-            timeout=30
-        )
-        response.raise_for_status()
-        results = response.json()
-        return results[:max_results]  # Ensure max 10 results
-    except Exception as e:
-        print(f"⚠️ API Error for query '{query[:50]}...': {e}")
-        return []
+class PredictionWriter:
+    """Appends each query's rows to the CSV as one flushed write"""
 
-def generate_predictions(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Generate predictions for all test queries
-    
-    Returns:
-        DataFrame with columns: Query, Assessment_url
-    """
-    predictions = []
-    
-    print(f"\n🔍 Generating predictions for {len(df)} test queries...\n")
-    
-    for idx, row in df.iterrows():
-        query = row.get('Query', row.get('query', ''))
-        
-        if not query:
-            print(f"⚠️ Skipping row {idx}: Missing query")
-            continue
-        
-        print(f"Processing {idx+1}/{len(df)}: {query[:60]}...")
-        
-        # Get recommendations
-        recommendations = get_recommendations(query, use_ai=False, max_results=10)
-        
-        if not recommendations:
-            print(f"   ❌ No recommendations found")
-            # Add at least one empty entry to maintain format
-            predictions.append({
-                'Query': query,
-                'Assessment_url': ''
-            })
-            continue
-        
-        # Add each recommendation as a separate row
-        for rec in recommendations:
-            predictions.append({
-                'Query': query,
-                'Assessment_url': rec['url']
-            })
-        
-        print(f"   ✅ Added {len(recommendations)} recommendations")
-        
-        # Small delay to avoid overwhelming API
-        time.sleep(0.5)
-    
-    # Create DataFrame
-    predictions_df = pd.DataFrame(predictions)
-    
-    return predictions_df
+    def __init__(self, output_path: Path, resume: bool = True):
+        self.output_path = output_path
+        self.completed = set()
+        self._lock = threading.Lock()
+
+        rows = self._load_rows() if resume else []
+        self.completed = {row[0] for row in rows}
+        # Rewrite what survived (drops a half-written trailing query) and append from there
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(rows)
+        self._file = open(output_path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+
+    def _load_rows(self) -> list:
+        if not self.output_path.exists():
+            return []
+        with open(self.output_path, "r", newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        # csv.reader keeps control characters inside fields; the file's last
+        # byte tells whether the final row was written in full
+        with open(self.output_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+            complete = f.read(1) in (b"", b"\n")
+        if rows and rows[0] == CSV_COLUMNS:
+            rows = rows[1:]
+        rows = [row for row in rows if len(row) == len(CSV_COLUMNS)]
+        if rows and not complete:
+            # The last query was cut off mid-write; it is fetched again
+            interrupted = rows[-1][0]
+            rows = [row for row in rows if row[0] != interrupted]
+        return rows
+
+    def write(self, query: str, urls: List[str]):
+        # A query without recommendations keeps one row with an empty URL
+        rows = [[query, url] for url in urls] or [[query, '']]
+        with self._lock:
+            self._writer.writerows(rows)
+            self._file.flush()
+            self.completed.add(query)
 
-def save_predictions(df: pd.DataFrame, output_path: str):
-    """Save predictions to CSV file"""
-    df.to_csv(output_path, index=False)
-    print(f"\n💾 Predictions saved to: {output_path}")
-    print(f"📊 Total rows: {len(df)}")
-    print(f"📝 Unique queries: {df['Query'].nunique()}")
+    def close(self):
+        self._file.close()
+
+def get_batch_recommendations(session: requests.Session, queries: List[str], api_url: str = API_URL,
+                              hybrid: bool = False) -> Dict[str, List[str]]:
+    """Get recommended URLs for a batch of queries from the API"""
+    response = session.post(
+        f"{api_url}/recommend/batch",
+        json={"queries": queries, "k": MAX_RESULTS, "hybrid": hybrid},
+        timeout=120
+    )
+    response.raise_for_status()
+    return {
+        item["query"]: [rec["url"] for rec in item["recommendations"][:MAX_RESULTS]]
+        for item in response.json()
+    }
+
+def predict_remote(queries: List[str], writer: PredictionWriter, api_url: str, hybrid: bool,
+                   batch_size: int, concurrency: int):
+    """Send queries in batches, ``concurrency`` batches in flight, writing rows as batches return"""
+    session = pooled_session(concurrency)
+
+    batches = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(get_batch_recommendations, session, batch, api_url, hybrid): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                predictions = future.result()
+            except Exception as e:
+                # Not written, so a resumed run retries the batch
+                print(f"⚠️ API Error for a batch of {len(batch)} queries: {e}")
+                continue
+            for query in batch:
+                writer.write(query, predictions.get(query, []))
+            print(f"   ✅ {len(writer.completed)} queries done")
+    session.close()
+
+def predict_local(queries: List[str], writer: PredictionWriter, hybrid: bool, batch_size: int):
+    """Query the retriever in-process: one encoder call and one vector search per batch"""
+    retriever = load_local_retriever()
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        urls = [query for query in batch if query.startswith(("http://", "https://"))]
+        texts = dict(zip(batch, batch))
+        for url, text in zip(urls, fetch_job_descriptions(urls)):
+            if isinstance(text, Exception) or not text:
+                # Written empty, like a query the API had no results for
+                print(f"⚠️ Could not fetch a job description from {url}: {text or 'no description found'}")
+                writer.write(texts.pop(url), [])
+            else:
+                texts[url] = text
+
+        if texts:
+            inputs = list(texts.values())
+            results = retriever.query(retriever.embed(inputs), MAX_RESULTS, None, inputs, hybrid)
+            for row, query in enumerate(texts):
+                writer.write(query, [metadata["url"] for metadata in results["metadatas"][row]])
+        print(f"   ✅ {len(writer.completed)} queries done")
 
 def validate_format(df: pd.DataFrame) -> bool:
     """Validate the CSV format"""
     print("\n🔍 Validating CSV format...")
     
     # Check columns
-    required_columns = ['Query', 'Assessment_url']
+    required_columns = CSV_COLUMNS
     if list(df.columns) != required_columns:
         print(f"❌ Invalid columns. Expected: {required_columns}, Got: {list(df.columns)}")
         return False
@@ -123,41 +178,71 @@ def validate_format(df: pd.DataFrame) -> bool:
     
     return True
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate test-set predictions for the SHL Assessment Recommender")
+    parser.add_argument("--local", action="store_true", help="query the retriever in app/ in-process (no API)")
+    parser.add_argument("--api-url", default=API_URL, help="API base URL for remote mode")
+    parser.add_argument("--batch-size", type=int, default=32, help="queries per batch request / encoder call")
+    parser.add_argument("--concurrency", type=int, default=4, help="batch requests in flight in remote mode")
+    parser.add_argument("--hybrid", action="store_true", help="fuse BM25 keyword hits with the dense results")
+    parser.add_argument("--output", type=Path, default=OUTPUT_CSV)
+    parser.add_argument("--fresh", action="store_true", help="overwrite the output instead of resuming it")
+    return parser.parse_args()
+
 def main():
     """Main prediction generation function"""
+    args = parse_args()
     print("🚀 Starting Test Predictions Generation\n")
     
-    # Check if API is running
-    try:
-        health_response = requests.get("https://shl-assessment-recommender-8awb.onrender.com/health", timeout=5)
-        if health_response.status_code == 200:
-            print("✅ API is running and healthy\n")
-        else:
-            print("⚠️ API health check failed")
+    if not args.local:
+        # Check if API is running
+        try:
+            health_response = requests.get(f"{args.api_url}/health", timeout=5)
+            if health_response.status_code == 200:
+                print("✅ API is running and healthy\n")
+            else:
+                print("⚠️ API health check failed")
+                return
+        except Exception as e:
+            print(f"❌ Cannot connect to API at {args.api_url}")
+            print("Please ensure the API is deployed and accessible")
             return
-    except Exception as e:
-        print(f"❌ Cannot connect to API at {API_URL}")
-        print("Please ensure the API is deployed and accessible")
-        return
     
     # Load test data
     df = load_test_data()
     if df is None:
         return
-    
-    # Generate predictions
-    predictions_df = generate_predictions(df)
-    
+
+    writer = PredictionWriter(args.output, resume=not args.fresh)
+    queries = [
+        q for q in dict.fromkeys(df['Query'].dropna())
+        if isinstance(q, str) and q and q not in writer.completed
+    ]
+    if writer.completed:
+        print(f"♻️ Resuming: {len(writer.completed)} queries already in {args.output}")
+    print(f"\n🔍 Generating predictions for {len(queries)} unique queries...\n")
+
+    start = time.perf_counter()
+    try:
+        if args.local:
+            predict_local(queries, writer, args.hybrid, args.batch_size)
+        else:
+            predict_remote(queries, writer, args.api_url, args.hybrid, args.batch_size, args.concurrency)
+    finally:
+        writer.close()
+    print(f"\n⏱️ Done in {time.perf_counter() - start:.1f}s")
+
     # Validate format
+    predictions_df = pd.read_csv(args.output)
     if not validate_format(predictions_df):
         print("\n❌ Format validation failed")
         return
-    
-    # Save to CSV
-    save_predictions(predictions_df, OUTPUT_CSV)
-    
+
+    print(f"\n💾 Predictions saved to: {args.output}")
+    print(f"📊 Total rows: {len(predictions_df)}")
+    print(f"📝 Unique queries: {predictions_df['Query'].nunique()}")
     print("\n✅ Predictions generation complete!")
-    print(f"\n📤 Submit this file: {OUTPUT_CSV}")
+    print(f"\n📤 Submit this file: {args.output}")
 
 if __name__ == "__main__":
     main()
@@ -3,6 +3,16 @@ import requests
 from streamlit_lottie import st_lottie
 import json
 
+
+def parse_server_timing(header: str) -> dict:
+    """Stage name -> milliseconds from the API's Server-Timing header"""
+    timings = {}
+    for metric in header.split(","):
+        name, _, params = metric.strip().partition(";")
+        if name and params.startswith("dur="):
+            timings[name] = float(params[4:])
+    return timings
+
 # Config
 st.set_page_config(
     page_title="SHL Assessment Recommender Pro",
@@ -248,7 +258,7 @@ with st.expander("How to Use This Application", expanded=False):
     
     st.markdown("### Understanding Results")
     st.markdown("""
-    - **Relevance Score**: Ranges from 0.0 (perfect match) to 1.0 (less relevant). Lower scores indicate better matches.
+    - **Relevance Score**: Ranges from 0.0 (unrelated) to 1.0 (perfect match). Higher scores indicate better matches.
     - **AI Insights**: When enabled, provides expert analysis on key skills measured, ideal candidate level, and best use cases.
     - **Assessment Details**: Includes duration, language support, job level suitability, and testing format options.
     """)
@@ -329,11 +339,13 @@ if st.button("Find Assessments", type="primary") and query:
     
     with st.spinner("Finding optimal assessments..."):
         try:
-            response = requests.post(
+            http_response = requests.post(
                 api_url,
                 json={"text": query, "use_ai": use_ai},
                 timeout=120
-            ).json()
+            )
+            response = http_response.json()
+            server_timing = parse_server_timing(http_response.headers.get("Server-Timing", ""))
 
             # Update progress
             progress_container.empty()
@@ -350,6 +362,12 @@ if st.button("Find Assessments", type="primary") and query:
                 st.warning("No assessments found. Try different keywords.")
             else:
                 st.success(f"Found {len(response)} matching assessments")
+
+                if server_timing:
+                    with st.expander("⏱️ Latency breakdown", expanded=False):
+                        stage_cols = st.columns(len(server_timing))
+                        for col, (stage_name, duration) in zip(stage_cols, server_timing.items()):
+                            col.metric(stage_name.capitalize(), f"{duration:.0f} ms")
                 
                 # Results summary
                 st.markdown(f"""
@@ -361,16 +379,17 @@ if st.button("Find Assessments", type="primary") and query:
                         {len(response)} Relevant Assessments Found
                     </h3>
                     <p style='color: #a8c7cb; margin: 0.5rem 0 0 0;'>
-                        Sorted by relevance score (lower is better)
+                        Ranked by relevance (higher score is better)
                     </p>
                 </div>
                 """, unsafe_allow_html=True)
                 
-                for idx, item in enumerate(sorted(response, key=lambda x: x['score']), 1):
+                # The API returns results already ranked best first
+                for idx, item in enumerate(response, 1):
                     # Safely handle all fields with defaults
                     name = item.get('name', 'Unknown Assessment')
                     url = item.get('url', '#')
-                    score = item.get('score', 1.0)
+                    score = item.get('score', 0.0)
                     duration = item.get('duration', 'Not specified')
                     languages = ''.join(item.get('languages', [])) or 'Not specified'
                     job_level = item.get('job_level', 'Not specified')